@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import subprocess
+import numpy as np
+import ffmpeg_io
+import trackcache
+
+# --- Реакция на звук ---
+# Звук клипа анализируется один раз до рендера: ffmpeg отдает моно float32 по пайпу,
+# STFT считается блоками по ANALYSIS_BLOCK секунд (длинный трек целиком в память не
+# грузится), хвост блока переходит в следующий. Из спектра берутся энергия (RMS) и
+# onset - спектральный поток (сумма роста лог-амплитуд по частотам).
+# Результат - по значению на кадр видео, нормированные в 0..1, так что на кадре
+# нужен только индекс. Кэш лежит в CACHE_DIR/звук по хэшу исходника.
+
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP = 512
+ANALYSIS_BLOCK = 10.0
+
+class AudioEnvelope:
+    def __init__(self, onset, energy, fps):
+        self.onset = onset
+        self.energy = energy
+        self.fps = fps
+
+    def index(self, t):
+        return min(max(int(round(t * self.fps)), 0), len(self.onset) - 1)
+
+    def onset_at(self, t):
+        return float(self.onset[self.index(t)]) if len(self.onset) else 0.0
+
+    def levels(self, t):
+        """(onset, energy) для кадра со временем t."""
+        if not len(self.onset):
+            return 0.0, 0.0
+        i = self.index(t)
+        return float(self.onset[i]), float(self.energy[i])
+
+def _grow(array, size):
+    if size <= len(array):
+        return array
+    return np.concatenate([array, np.zeros(max(size, len(array) * 2) - len(array), array.dtype)])
+
+def analyze(path, fps, n_frames=0):
+    """Onset и энергия по кадрам видео (сырые, без нормировки)."""
+    cmd = [ffmpeg_io.FFMPEG_BINARY, "-loglevel", "error", "-i", path, "-vn",
+           "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    window = np.hanning(N_FFT).astype(np.float32)
+    onset = np.zeros(max(n_frames, 1), np.float32)
+    energy_sum = np.zeros_like(onset)
+    energy_count = np.zeros_like(onset)
+    carry = np.empty(0, np.float32)
+    prev_log = None
+    position = 0  # номер первого сэмпла carry от начала трека
+    last = -1
+    block = np.empty(int(ANALYSIS_BLOCK * SAMPLE_RATE), np.float32)
+    view = memoryview(block).cast("B")
+    try:
+        while True:
+            got = 0
+            while got < len(view):
+                n = proc.stdout.readinto(view[got:])
+                if not n:
+                    break
+                got += n
+            samples = np.concatenate([carry, block[:got // 4]])
+            count = (len(samples) - N_FFT) // HOP + 1 if len(samples) >= N_FFT else 0
+            if count > 0:
+                frames = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP][:count]
+                log = np.log1p(np.abs(np.fft.rfft(frames * window, axis=1)))
+                flux = np.empty(count, np.float32)
+                flux[0] = 0.0 if prev_log is None else np.maximum(log[0] - prev_log, 0).sum()
+                flux[1:] = np.maximum(np.diff(log, axis=0), 0).sum(axis=1)
+                prev_log = log[-1]
+                rms = np.sqrt(np.mean(frames ** 2, axis=1))
+
+                # окно STFT -> кадр видео по времени его центра
+                centers = (position + np.arange(count) * HOP + N_FFT / 2) / SAMPLE_RATE
+                index = (centers * fps).astype(np.int64)
+                last = max(last, int(index[-1]))
+                onset = _grow(onset, last + 1)
+                energy_sum = _grow(energy_sum, last + 1)
+                energy_count = _grow(energy_count, last + 1)
+                np.maximum.at(onset, index, flux)
+                np.add.at(energy_sum, index, rms)
+                np.add.at(energy_count, index, 1)
+
+                position += count * HOP
+                carry = samples[count * HOP:]
+            else:
+                carry = samples
+            if got < len(view):
+                break
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+    size = max(n_frames, last + 1, 1)
+    onset = _grow(onset, size)[:size]
+    energy = _grow(energy_sum, size)[:size] / np.maximum(_grow(energy_count, size)[:size], 1)
+    return onset, energy.astype(np.float32)
+
+def normalize(values, low=50, high=98):
+    # перцентили, а не min/max: один громкий удар не должен глушить все остальное
+    if not len(values) or not values.any():
+        return np.zeros_like(values)
+    lo, hi = np.percentile(values, [low, high])
+    if hi <= lo:
+        hi = lo + 1e-6
+    return np.clip((values - lo) / (hi - lo), 0, 1).astype(np.float32)
+
+def envelope_path(config, input_path, fps):
+    params = {"fps": fps, "sample_rate": SAMPLE_RATE, "n_fft": N_FFT, "hop": HOP}
+    h = hashlib.sha1()
+    h.update(trackcache.source_hash(input_path).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return os.path.join(config.get("CACHE_DIR", "кэш"), "звук", h.hexdigest() + ".npz")
+
+def load_envelope(input_path, config, info=None):
+    """Огибающая звука клипа: из кэша или анализом (без звука - нули)."""
+    info = info or ffmpeg_io.probe_video(input_path)
+    fps = info["fps"]
+    path = envelope_path(config, input_path, fps)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return AudioEnvelope(data["onset"], data["energy"], fps)
+
+    if info["has_audio"]:
+        print("анализирую звук...")
+        onset, energy = analyze(input_path, fps, info["n_frames"])
+        onset, energy = normalize(onset), normalize(energy, low=0, high=99)
+    else:
+        onset = energy = np.zeros(max(info["n_frames"], 1), np.float32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, onset=onset, energy=energy)
+    os.replace(tmp, path)
+    return AudioEnvelope(onset, energy, fps)
@@ -0,0 +1,235 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import test as engine
+import trackcache
+
+# --- Пакетный рендер без GUI ---
+# Задания: JSON (список или {"config": {...}, "jobs": [...]}), JSONL (задание на строку)
+# или маска файлов (тогда результаты кладутся в --output-dir).
+# Задание: {"input": ..., "output": ..., "config": {...}}.
+# Несколько вариантов оформления одного клипа за одно декодирование и один трекинг:
+# {"input": ..., "config": {...}, "variants": [{"config": {...}, "output": ...}, ...]}
+# (в config варианта - только визуальные параметры, см. test.run_variants_processing).
+# Готовые результаты пропускаются: рядом с кэшем лежит отметка с ключом задания
+# (хэш исходника + полный конфиг), она пишется только после успешного рендера.
+#
+#   python batch.py ночь.jsonl -j 8 --retries 1 --summary отчет.json
+#   python batch.py "исходники/*.mp4" --output-dir результ --set SHAPE='"square"'
+#   python batch.py задания.jsonl --in-point 60 --out-point 65 --proxy 640 --fps-divisor 2
+#   python batch.py "исходники/*.mp4" --output-dir результ --track-only   (только кэш треков)
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+def load_jobs(sources, base_config, output_dir=None):
+    jobs = []
+    for source in sources:
+        if source.endswith(".jsonl"):
+            with open(source, encoding="utf8") as f:
+                jobs += [json.loads(line) for line in f if line.strip()]
+        elif source.endswith(".json"):
+            with open(source, encoding="utf8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                shared = data.get("config", {})
+                jobs += [dict(job, config=dict(shared, **job.get("config", {}))) for job in data["jobs"]]
+            else:
+                jobs += data
+        else:
+            if output_dir is None:
+                raise ValueError(f"для маски {source} нужен --output-dir")
+            for path in sorted(glob.glob(source)):
+                if path.lower().endswith(VIDEO_EXTENSIONS):
+                    jobs.append({"input": path, "output": os.path.join(output_dir, os.path.basename(path))})
+
+    for job in jobs:
+        job["config"] = dict(base_config, **job.get("config", {}))
+    return jobs
+
+def job_outputs(job):
+    if "variants" in job:
+        return [variant["output"] for variant in job["variants"]]
+    return [job["output"]]
+
+def job_label(job):
+    return ", ".join(job_outputs(job))
+
+def job_config(job):
+    config = engine.DEFAULT_CONFIG.copy()
+    config.update(job["config"])
+    return engine.tracking_params(config)
+
+def job_key(job):
+    config = job_config(job)
+    blob = json.dumps([config, job.get("variants")], sort_keys=True, default=str)
+    h = hashlib.sha1()
+    h.update(trackcache.source_hash(job["input"]).encode())
+    h.update(blob.encode())
+    return h.hexdigest()
+
+def stamp_path(job):
+    outputs = "\n".join(os.path.abspath(path) for path in job_outputs(job))
+    name = hashlib.sha1(outputs.encode()).hexdigest()[:20]
+    return os.path.join(job_config(job).get("CACHE_DIR", "кэш"), "задания", name + ".json")
+
+def is_up_to_date(job):
+    path = stamp_path(job)
+    if not all(os.path.exists(output) for output in job_outputs(job)) or not os.path.exists(path):
+        return False
+    with open(path, encoding="utf8") as f:
+        return json.load(f).get("key") == job_key(job)
+
+def write_stamp(job):
+    path = stamp_path(job)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump({"key": job_key(job), "input": job["input"], "output": job_label(job)}, f, ensure_ascii=False)
+
+def _init_worker():
+    # после fork у всех процессов одинаковое состояние random
+    random.seed(os.urandom(16))
+
+def run_job(job, track_only=False):
+    """Рендер одного задания в процессе пула; возвращает кадры и время."""
+    config = job_config(job)
+    if track_only:
+        # только трекинг в кэш треков: потом рендер с TRACK_CACHE его не повторяет
+        start = time.perf_counter()
+        _, frames = engine.run_tracking_pass(config, job["input"])
+        duration = time.perf_counter() - start
+        return {"frames": frames, "duration": round(duration, 3),
+                "fps": round(frames / duration, 2) if duration > 0 and frames else None}
+    for output in job_outputs(job):
+        out_dir = os.path.dirname(output)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    if "variants" in job:
+        # варианты всегда идут одним проходом: без фрагмента, частей, кэша сегментов и процессов
+        if engine.is_partial(config):
+            raise ValueError("варианты рендерятся только целиком (без фрагмента и прокси)")
+        variants = [(variant.get("config", {}), variant["output"]) for variant in job["variants"]]
+        frames = engine.run_variants_processing(config, job["input"], variants, logger=None)
+    elif engine.is_partial(config):
+        frames = engine.run_range_processing(config, job["input"], job["output"], logger=None)
+    elif config.get('RESUMABLE'):
+        # после сбоя повтор задания продолжит с последнего готового сегмента
+        import resume
+        frames = resume.run_resumable_processing(config, job["input"], job["output"])
+    elif config.get('SEGMENT_CACHE'):
+        # одинаковые куски разных заданий и прошлых запусков берутся из кэша
+        import segcache
+        frames = segcache.run_cached_processing(config, job["input"], job["output"])
+    elif config.get('WORKERS', 1) != 1:
+        import parallel
+        frames = parallel.run_parallel_processing(config, job["input"], job["output"])
+    else:
+        frames, _ = engine.run_stream_processing(config, job["input"], job["output"], logger=None)
+    duration = time.perf_counter() - start
+    write_stamp(job)
+    return {"frames": frames, "duration": round(duration, 3), "fps": round(frames / duration, 2) if duration > 0 else None}
+
+def track_is_cached(job):
+    config = job_config(job)
+    return trackcache.has_track(trackcache.cache_path(config, trackcache.tracking_key(job["input"], config)))
+
+def run_batch(jobs, workers=None, retries=0, force=False, track_only=False):
+    results = [None] * len(jobs)
+    todo = []
+    for i, job in enumerate(jobs):
+        try:
+            ready = not force and (track_is_cached(job) if track_only else is_up_to_date(job))
+        except OSError as error:
+            # нет исходника и т.п.: падает только это задание, а не весь пакет
+            results[i] = {"input": job["input"], "output": job_label(job), "attempts": 0, "status": "failed",
+                          "error": f"{type(error).__name__}: {error}"}
+            print(f"[{i + 1}/{len(jobs)}] не удалось: {job_label(job)}: {error}")
+            continue
+        if ready:
+            results[i] = {"input": job["input"], "output": job_label(job), "status": "skipped"}
+            print(f"[{i + 1}/{len(jobs)}] пропускаю, уже готово: {job_label(job)}")
+        else:
+            todo.append(i)
+
+    attempts = {i: 0 for i in todo}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                             mp_context=multiprocessing.get_context(), initializer=_init_worker) as pool:
+        pending = {}
+        for i in todo:
+            attempts[i] += 1
+            pending[pool.submit(run_job, jobs[i], track_only)] = i
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                job = jobs[i]
+                result = {"input": job["input"], "output": job_label(job), "attempts": attempts[i]}
+                error = future.exception()
+                if error is None:
+                    result.update(future.result(), status="done")
+                    print(f"[{i + 1}/{len(jobs)}] готово: {job_label(job)} ({result['frames']} кадров, {result['fps']} fps)")
+                elif attempts[i] <= retries:
+                    print(f"[{i + 1}/{len(jobs)}] ошибка, повтор: {job_label(job)}: {error}")
+                    attempts[i] += 1
+                    pending[pool.submit(run_job, job, track_only)] = i
+                    continue
+                else:
+                    result.update(status="failed", error=f"{type(error).__name__}: {error}")
+                    print(f"[{i + 1}/{len(jobs)}] не удалось: {job_label(job)}: {error}")
+                results[i] = result
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный рендер без GUI")
+    parser.add_argument("sources", nargs="+", help="файлы заданий .json/.jsonl или маски исходных видео")
+    parser.add_argument("-o", "--output-dir", help="куда класть результаты для масок файлов")
+    parser.add_argument("-c", "--config", help="JSON с общим конфигом для всех заданий")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="переопределить параметр (значение в JSON), можно несколько раз")
+    parser.add_argument("--in-point", type=float, help="рендерить с этой секунды")
+    parser.add_argument("--out-point", type=float, help="рендерить до этой секунды")
+    parser.add_argument("--proxy", type=int, metavar="WIDTH", help="черновик в уменьшенном размере (ширина в px)")
+    parser.add_argument("--fps-divisor", type=int, help="черновик: каждый N-й кадр")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="сколько заданий одновременно (0 = все ядра)")
+    parser.add_argument("--retries", type=int, default=0, help="повторов после ошибки")
+    parser.add_argument("--force", action="store_true", help="рендерить даже готовые")
+    parser.add_argument("--track-only", action="store_true",
+                        help="только посчитать кэш треков (для рендера с TRACK_CACHE), без рисования и кодирования")
+    parser.add_argument("--summary", default="batch_summary.json", help="куда записать отчет")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_config = {}
+    if args.config:
+        with open(args.config, encoding="utf8") as f:
+            base_config = json.load(f)
+    for item in args.set:
+        key, value = item.split("=", 1)
+        base_config[key] = json.loads(value)
+    for key, value in (("IN_POINT", args.in_point), ("OUT_POINT", args.out_point),
+                       ("PROXY_WIDTH", args.proxy), ("FPS_DIVISOR", args.fps_divisor)):
+        if value is not None:
+            base_config[key] = value
+
+    jobs = load_jobs(args.sources, base_config, args.output_dir)
+    print(f"заданий: {len(jobs)}")
+    results = run_batch(jobs, args.jobs, args.retries, args.force, args.track_only)
+
+    with open(args.summary, "w", encoding="utf8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    failed = sum(r["status"] == "failed" for r in results)
+    print(f"готово: {sum(r['status'] == 'done' for r in results)}, пропущено: "
+          f"{sum(r['status'] == 'skipped' for r in results)}, ошибок: {failed}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
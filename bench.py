@@ -0,0 +1,341 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+import itertools
+import multiprocessing
+import cv2
+import numpy as np
+import ffmpeg_io
+import test as engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# --- Бенчмарк ---
+# Синтетические видео (движущиеся текстурные пятна на плавном фоне, по желанию со
+# склейками) генерируются детерминированно и кэшируются в --video-dir. Каждый случай
+# матрицы (видео x MAX_TRACKERS x SHAPE x LINE_THICKNESS) идет в отдельном процессе,
+# чтобы пиковая память была своя. Результаты - JSON, их можно сравнить через --compare.
+#
+#   python bench.py --out bench_old.json
+#   python bench.py --out bench_new.json --compare bench_old.json
+#   python bench.py --startup --out startup.json   (время до окна GUI и импорта движка)
+
+def _scene(rng, width, height, n_patches):
+    # фон - плавный градиент, пятна - размытый шум (есть за что зацепиться трекеру)
+    gx = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    gy = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    a, b, c = rng.uniform(30, 120, 3)
+    background = np.clip(a + b * gx + c * gy * 0.5, 0, 255).astype(np.uint8)
+    background = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+
+    size = max(min(width, height) // 8, 8)
+    patches = []
+    for _ in range(n_patches):
+        texture = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        texture = cv2.GaussianBlur(texture, (3, 3), 0)
+        pos = rng.uniform([0, 0], [width - size, height - size])
+        vel = rng.uniform(-1, 1, 2) * max(width, height) / 200
+        patches.append([texture, pos, vel])
+    return background, patches
+
+def make_synthetic_video(path, width, height, n_frames, fps=25, cuts=(), seed=0, n_patches=12):
+    """Детерминированное тестовое видео: те же параметры - те же кадры."""
+    rng = np.random.default_rng(seed)
+    background, patches = _scene(rng, width, height, n_patches)
+    writer = ffmpeg_io.FFmpegWriter(path, width, height, fps)
+    frame = np.empty((height, width, 3), np.uint8)
+    try:
+        for index in range(n_frames):
+            if index in cuts:
+                background, patches = _scene(rng, width, height, n_patches)
+            np.copyto(frame, background)
+            for patch in patches:
+                texture, pos, vel = patch
+                size = texture.shape[0]
+                pos += vel
+                # отскок от краев
+                for axis, limit in ((0, width - size), (1, height - size)):
+                    if not 0 <= pos[axis] <= limit:
+                        vel[axis] = -vel[axis]
+                        pos[axis] = min(max(pos[axis], 0), limit)
+                x, y = int(pos[0]), int(pos[1])
+                frame[y:y + size, x:x + size] = texture
+            writer.write(frame)
+    finally:
+        writer.close()
+
+def synthetic_video(video_dir, width, height, seconds, cuts, fps=25):
+    n_frames = int(seconds * fps)
+    cut_frames = tuple(range(n_frames // (cuts + 1), n_frames, n_frames // (cuts + 1)))[:cuts] if cuts else ()
+    name = f"synth_{width}x{height}_{seconds}s_{cuts}cuts.mp4"
+    path = os.path.join(video_dir, name)
+    if not os.path.exists(path):
+        print(f"генерирую {name}...")
+        tmp = path + ".tmp.mp4"
+        make_synthetic_video(tmp, width, height, n_frames, fps, cut_frames)
+        os.replace(tmp, path)
+    return path
+
+def peak_rss_mb(who):
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    # Linux - килобайты, macOS - байты
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def percentiles(values):
+    ms = np.asarray(values) * 1000
+    return {"p50": round(float(np.percentile(ms, 50)), 2), "p90": round(float(np.percentile(ms, 90)), 2),
+            "p99": round(float(np.percentile(ms, 99)), 2), "max": round(float(ms.max()), 2)}
+
+def run_case(case):
+    """Один прогон: декодирование, трекинг, рисование и кодирование с замером каждой стадии."""
+    config = engine.DEFAULT_CONFIG.copy()
+    config.update(case["config"])
+    engine.tracking_params(config)
+    tracker = engine.Tracker(config)
+
+    out_dir = tempfile.mkdtemp(prefix="bench_")
+    reader = ffmpeg_io.open_reader(case["input"], config.get('DECODER', 'ffmpeg'))
+    writer = ffmpeg_io.FFmpegWriter(os.path.join(out_dir, "out.mp4"), reader.width, reader.height, reader.fps,
+                                    encoder=ffmpeg_io.encoder_from_config(config))
+    frame = np.empty((reader.height, reader.width, 3), np.uint8)
+    decode = encode = 0.0
+    latencies = []
+    try:
+        wall = time.perf_counter()
+        index = 0
+        while True:
+            start = time.perf_counter()
+            if not reader.read(frame):
+                break
+            decoded = time.perf_counter()
+            tracker.process(frame, index / reader.fps, in_place=True)
+            drawn = time.perf_counter()
+            writer.write(frame)
+            done = time.perf_counter()
+            decode += decoded - start
+            encode += done - drawn
+            latencies.append(done - start)
+            index += 1
+        reader.close()
+        start = time.perf_counter()
+        writer.close()
+        encode += time.perf_counter() - start
+        wall = time.perf_counter() - wall
+    finally:
+        reader.close()
+        writer.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    stages = {"decode": decode, **tracker.timings, "encode": encode}
+    return dict(case, frames=index, wall=round(wall, 3), fps=round(index / wall, 2),
+                latency_ms=percentiles(latencies), redetections=tracker.redetector.detections,
+                stages_s={k: round(v, 4) for k, v in stages.items()},
+                peak_rss_mb=peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                ffmpeg_peak_rss_mb=peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None)
+
+# --- Время запуска ---
+# Каждый замер - новый процесс python. Импорты меряются изнутри процесса,
+# время до окна печатает сам gui.py (BREAKCORE_STARTUP_PROBE), если есть дисплей.
+
+STARTUP_IMPORTS = {
+    # окно строится только под __main__, импорт модуля его не открывает
+    "gui_imports": "import gui",
+    "engine_import": "import test",
+}
+
+def _timed_import(statement):
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(out.stdout.strip().splitlines()[-1])
+
+def _time_to_window():
+    env = dict(os.environ, BREAKCORE_STARTUP_PROBE="1")
+    gui = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gui.py")
+    out = subprocess.run([sys.executable, gui], capture_output=True, text=True, env=env, timeout=60)
+    for line in out.stdout.splitlines():
+        if line.startswith("window "):
+            return float(line.split()[1])
+    return None
+
+def run_startup(repeat):
+    result = {}
+    for name, statement in STARTUP_IMPORTS.items():
+        result[name] = round(float(np.median([_timed_import(statement) for _ in range(repeat)])), 4)
+    has_display = sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY"))
+    times = [_time_to_window() for _ in range(repeat)] if has_display else []
+    times = [t for t in times if t is not None]
+    result["time_to_window"] = round(float(np.median(times)), 4) if times else None
+    return result
+
+def compare_startup(startup, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf8") as f:
+        old = json.load(f).get("startup")
+    if not old:
+        return 0
+    regressions = 0
+    print(f"\nзапуск, сравнение с {baseline_path}:")
+    for name, value in startup.items():
+        if value is None or old.get(name) is None:
+            continue
+        change = value / old[name] - 1
+        mark = ""
+        if change > tolerance:
+            mark = "  <-- медленнее"
+            regressions += 1
+        print(f"  {name:15s} {old[name]:.3f} -> {value:.3f} с ({change:+.1%}){mark}")
+    return regressions
+
+# --- Проверка адаптивного переобнаружения ---
+# REDETECT_MODE="adaptive" должен искать новые точки реже, чем "interval", на тех же видео.
+
+def count_detections(path, config):
+    """Только трекинг: сколько раз искали новые точки и сколько секунд на это ушло."""
+    config = engine.tracking_params(dict(engine.DEFAULT_CONFIG, **config))
+    tracker = engine.Tracker(config)
+    reader = ffmpeg_io.open_reader(path, config.get('DECODER', 'ffmpeg'))
+    frame = np.empty((reader.height, reader.width, 3), np.uint8)
+    index = 0
+    try:
+        while reader.read(frame):
+            tracker.update(frame, index / reader.fps)
+            index += 1
+    finally:
+        reader.close()
+    return tracker.redetector.detections, tracker.timings["redetect"]
+
+def run_redetect_check(args):
+    failures = 0
+    print("переобнаружений: interval -> adaptive")
+    for res, seconds, cuts, trackers in itertools.product(args.res, args.seconds, args.cuts, args.trackers):
+        width, height = (int(v) for v in res.split("x"))
+        path = synthetic_video(args.video_dir, width, height, seconds, cuts)
+        counts = {}
+        for mode in ("interval", "adaptive"):
+            config = dict(args.extra, MAX_TRACKERS=trackers, REDETECT_MODE=mode, SEED="bench")
+            counts[mode] = count_detections(path, config)
+        mark = ""
+        if counts["adaptive"][0] >= counts["interval"][0]:
+            mark = "  <-- adaptive не реже"
+            failures += 1
+        print(f"  {res} {seconds}s cuts={cuts} trackers={trackers}: {counts['interval'][0]} ({counts['interval'][1]:.3f} с)"
+              f" -> {counts['adaptive'][0]} ({counts['adaptive'][1]:.3f} с){mark}")
+    return failures
+
+def case_id(case):
+    blob = json.dumps([case["video"], case["config"]], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+def build_cases(args):
+    cases = []
+    for res, seconds, cuts in itertools.product(args.res, args.seconds, args.cuts):
+        width, height = (int(v) for v in res.split("x"))
+        video = {"width": width, "height": height, "seconds": seconds, "cuts": cuts}
+        path = synthetic_video(args.video_dir, width, height, seconds, cuts)
+        for trackers, shape, thickness in itertools.product(args.trackers, args.shapes, args.thickness):
+            config = dict(args.extra, MAX_TRACKERS=trackers, SHAPE=shape, LINE_THICKNESS=thickness, SEED="bench")
+            case = {"video": video, "config": config, "input": path}
+            case["id"] = case_id(case)
+            cases.append(case)
+    return cases
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf8") as f:
+        baseline = {c["id"]: c for c in json.load(f)["cases"]}
+    regressions = 0
+    print(f"\nсравнение с {baseline_path}:")
+    for case in results:
+        old = baseline.get(case["id"])
+        if old is None:
+            continue
+        change = case["fps"] / old["fps"] - 1
+        mark = ""
+        if change < -tolerance:
+            mark = "  <-- медленнее"
+            regressions += 1
+        print(f"  {case['id']}  {old['fps']:8.2f} -> {case['fps']:8.2f} fps ({change:+.1%}){mark}")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк трекинга и рендера на синтетических видео")
+    parser.add_argument("--res", nargs="+", default=["640x360", "1280x720"], help="разрешения WxH")
+    parser.add_argument("--seconds", nargs="+", type=float, default=[4], help="длины тестовых видео")
+    parser.add_argument("--cuts", nargs="+", type=int, default=[0, 2], help="число склеек в видео")
+    parser.add_argument("--trackers", nargs="+", type=int, default=[15, 100], help="значения MAX_TRACKERS")
+    parser.add_argument("--shapes", nargs="+", default=["star", "square"], help="значения SHAPE")
+    parser.add_argument("--thickness", nargs="+", type=int, default=[1, 3], help="значения LINE_THICKNESS")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="доп. параметр конфига для всех случаев (значение в JSON)")
+    parser.add_argument("--video-dir", default=os.path.join("кэш", "бенчмарк"), help="куда складывать тестовые видео")
+    parser.add_argument("--out", default="bench_results.json", help="куда записать результаты")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="допустимое падение fps при сравнении")
+    parser.add_argument("--startup", action="store_true", help="мерить только время запуска (импорты, окно GUI)")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов замера запуска")
+    parser.add_argument("--redetect-check", action="store_true",
+                        help="только проверить, что REDETECT_MODE=adaptive ищет реже interval")
+    args = parser.parse_args(argv)
+    args.extra = {}
+    for item in args.set:
+        key, value = item.split("=", 1)
+        args.extra[key] = json.loads(value)
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "opencv": cv2.__version__, "cpus": os.cpu_count()},
+    }
+    if args.startup:
+        report["startup"] = run_startup(args.repeat)
+        print("запуск:", ", ".join(f"{k} {v} с" for k, v in report["startup"].items()))
+        with open(args.out, "w", encoding="utf8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"результаты: {args.out}")
+        if args.compare:
+            return 1 if compare_startup(report["startup"], args.compare, args.tolerance) else 0
+        return 0
+
+    os.makedirs(args.video_dir, exist_ok=True)
+    if args.redetect_check:
+        return 1 if run_redetect_check(args) else 0
+    cases = build_cases(args)
+    print(f"случаев: {len(cases)}")
+
+    results = []
+    # новый процесс на каждый случай: пиковая память не смешивается между случаями
+    with multiprocessing.get_context().Pool(1, maxtasksperchild=1) as pool:
+        for i, case in enumerate(cases):
+            result = pool.apply(run_case, (case,))
+            results.append(result)
+            stages = " ".join(f"{k}={v:.2f}" for k, v in result["stages_s"].items())
+            print(f"[{i + 1}/{len(cases)}] {result['video']['width']}x{result['video']['height']} "
+                  f"cuts={result['video']['cuts']} trackers={result['config']['MAX_TRACKERS']} "
+                  f"{result['config']['SHAPE']} t={result['config']['LINE_THICKNESS']}: "
+                  f"{result['fps']} fps, p99 {result['latency_ms']['p99']} ms | {stages}")
+
+    report["cases"] = results
+    with open(args.out, "w", encoding="utf8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"результаты: {args.out}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.tolerance) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# Настройки по умолчанию отдельно от движка: их можно импортировать
+# без cv2 / numpy / moviepy (GUI открывается сразу, движок грузится потом).
+
+# --- Defaults ---
+DEFAULT_CONFIG = {
+    "MAX_TRACKERS": 15,
+    "REDETECTION_INTERVAL": 30,
+    "WORDS": ["CAN", "YOU", "SEE", "ME", "?"],
+    "OBJ_LIFESPAN_MIN": 1.0,
+    "OBJ_LIFESPAN_MAX": 3.0,
+    "OBJ_SIZE_MIN": 30,
+    "OBJ_SIZE_MAX": 70,
+    "STAR_POINTS": 5,
+    "LINE_THICKNESS": 1,
+    "SHAPE": "star",
+    "THRESHOLD": 0.7,
+    "BACKEND": "stream", # "stream" (ffmpeg пайпы) или "moviepy"
+    "DECODER": "ffmpeg", # "ffmpeg" или "opencv" для stream
+    "PIPELINE": False,   # декодер / трекинг / энкодер в отдельных потоках
+    "QUEUE_DEPTH": 4,    # размер очередей кадров между стадиями
+    "WORKERS": 1,        # >1 (или 0 = все ядра): параллельный рендер по сегментам
+    "SCENE_ALIGN": True, # резать сегменты по склейкам (пороги - SCENE_CUT_THRESHOLD / SCENE_CUT_HIST)
+    "WARMUP_FRAMES": 10, # прогрев трекера перед началом сегмента
+    "SEED": None,        # зерно рендера: параметры объектов и связи (с ним рендер повторяется бит в бит; None = каждый раз по-разному)
+    "TRACK_CACHE": False, # сохранять трек на диск и повторять его, если меняется только визуал
+    "CACHE_DIR": "кэш",
+    "LABEL_CACHE": True, # подписи из готовых спрайтов вместо cv2.putText на каждый объект
+    "TEXT_LEVELS": 32,   # на сколько оттенков квантуется мерцание подписей
+    "LABEL_CACHE_SIZE": 256,
+    "FB_CHECK": False,   # отбрасывать точки, которые не возвращаются обратным потоком
+    "FB_THRESHOLD": 1.0, # допустимая ошибка прямого-обратного прохода (px)
+    "TRACK_SCALE": 1.0,  # трекинг на уменьшенном кадре (0.5 = вдвое меньше)
+    "TRACK_MAX_EDGE": 0, # или: длинная сторона кадра для трекинга в px (0 = как есть)
+    "REDETECT_MODE": "interval", # "interval" или "adaptive" (по потерям / ошибке потока, только в пустых клетках)
+    "REDETECT_LOSS_RATE": 0.3,   # adaptive: доля потерянных трекеров, после которой ищем новые
+    "REDETECT_ERROR_BUDGET": 200.0, # adaptive: накопленная средняя ошибка LK до нового поиска
+    "REDETECT_GRID": (4, 4),     # adaptive: сетка клеток (столбцы, строки)
+    "SPAWN_MIN_DIST": 0,  # минимальное расстояние от нового объекта до живых (px, 0 = маска кругами как раньше)
+    "LINK_MODE": "random", # линии между объектами: "random" (случайные пары), "knn" или "radius"
+    "LINK_K": 2,          # knn: сколько ближайших соседей соединять
+    "LINK_RADIUS": 150.0, # radius: соединять все пары ближе этого расстояния (px)
+    "TRACE_FILE": "",     # писать трассу по кадрам (JSONL) в этот файл (пусто = нет)
+    "PROFILE_WINDOW": 50, # окно живых счетчиков профилировщика (кадров)
+    "CHECKPOINT_INTERVAL": 30, # снимок состояния трекера каждые N кадров, только при перемотке (moviepy); 0 = сброс, как раньше
+    "CHECKPOINT_LIMIT": 32,    # сколько снимков держать (при переполнении шаг удваивается)
+    "RESUMABLE": False,   # писать сегментами со снимками трекера, чтобы продолжить после сбоя/отмены
+    "SEGMENT_SECONDS": 10, # длина сегмента в режиме RESUMABLE
+    "VIDEO_CODEC": "libx264",
+    "PRESET": None,       # пресет x264 (ultrafast ... veryslow), None = по умолчанию (medium)
+    "CRF": None,          # качество (меньше = лучше, 18-28), None = по умолчанию
+    "BITRATE": None,      # или битрейт, например "8M" (важнее CRF)
+    "ENCODER_THREADS": 0, # потоки энкодера (0 = сам решает)
+    "PIX_FMT": "yuv420p",
+    "DRAFT": False,       # черновик: ultrafast и только ключевые кадры
+    "AUDIO_MODE": "aac",  # звук: "aac" (перекодировать), "copy" (как в исходнике) или "none"
+    "SCENE_CUT": False,   # искать склейки: на склейке трекеры сбрасываются, LK не запускается
+    "SCENE_CUT_THRESHOLD": 5.0, # скачок миниатюры: среднее |разница| серых 32x18 (0-255); движение ~0.5-4, склейка 6-35
+    "SCENE_CUT_HIST": 0.12, # и скачок гистограммы: доля яркости, сменившая корзину (0-1); движение < 0.02, склейка 0.15+
+    "SCENE_CUT_FILE": "", # куда записать время склеек (JSON список секунд)
+    "AUDIO_REACTIVE": False, # реакция на звук клипа (анализ один раз, кэш в CACHE_DIR/звук)
+    "AUDIO_ONSET_THRESHOLD": 0.6, # сила удара (0-1), с которой начинается всплеск объектов
+    "AUDIO_BURST": 0.5,   # на сильном ударе до MAX_TRACKERS * (1 + AUDIO_BURST) объектов
+    "AUDIO_SIZE": 0.5,    # размер растет с громкостью: до (1 + AUDIO_SIZE) раз
+    "AUDIO_SHIMMER": 1.0, # насколько мерцание следует за ударами (0 - как раньше)
+    "RANGES": [],         # визуальные настройки на отрезке: [{"start": 10, "end": 20, "config": {"SHAPE": "square"}}]
+    "SEGMENT_CACHE": False, # кэш готовых сегментов по SEGMENT_SECONDS: перерендер только измененных кусков
+    "IN_POINT": 0.0,      # рендер фрагмента: с этой секунды (трекер прогревается на WARMUP_FRAMES кадрах до нее)
+    "OUT_POINT": None,    # и до этой секунды (None = до конца)
+    "PROXY_WIDTH": 0,     # прокси: ширина кадра в px (0 = как в исходнике), размеры рисования пересчитываются
+    "FPS_DIVISOR": 1      # прокси: каждый N-й кадр
+}
@@ -0,0 +1,310 @@
+import os
+import re
+import shutil
+import subprocess
+import time
+import numpy as np
+import cv2
+
+# --- Поиск ffmpeg ---
+# moviepy берет бинарник из imageio_ffmpeg, используем тот же самый,
+# но даем переопределить через переменную окружения.
+def get_ffmpeg_binary():
+    exe = os.environ.get("FFMPEG_BINARY")
+    if exe:
+        return exe
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+FFMPEG_BINARY = get_ffmpeg_binary()
+
+def ffmpeg_available():
+    """Есть ли бинарник ffmpeg (путь к файлу или имя в PATH)."""
+    return os.path.isfile(FFMPEG_BINARY) or shutil.which(FFMPEG_BINARY) is not None
+
+# --- Информация о видео ---
+def probe_video(path):
+    if not os.path.exists(path):
+        raise IOError(f"Файл не найден: {path}")
+
+    proc = subprocess.run([FFMPEG_BINARY, "-hide_banner", "-i", path],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    info = proc.stderr.decode("utf8", errors="ignore")
+
+    video_line = next((l for l in info.splitlines() if re.search(r"Stream #.*Video:", l)), None)
+    if video_line is None:
+        raise IOError(f"В файле нет видеопотока: {path}")
+
+    size = re.search(r" (\d+)x(\d+)[,\s]", video_line)
+    fps = re.search(r"([\d.]+) fps", video_line) or re.search(r"([\d.]+) tbr", video_line)
+    duration = re.search(r"Duration: (\d+):(\d+):([\d.]+)", info)
+
+    width, height = int(size.group(1)), int(size.group(2))
+    fps = float(fps.group(1)) if fps else 25.0
+    seconds = 0.0
+    if duration:
+        h, m, s = duration.groups()
+        seconds = int(h) * 3600 + int(m) * 60 + float(s)
+
+    return {
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "duration": seconds,
+        "n_frames": int(round(seconds * fps)),
+        "has_audio": re.search(r"Stream #.*Audio:", info) is not None,
+    }
+
+# --- Чтение кадров ---
+class FFmpegReader:
+    """Читает сырые BGR кадры из пайпа ffmpeg в один переиспользуемый буфер."""
+
+    def __init__(self, path, info=None, start_frame=0, size=None, step=1):
+        self.path = path
+        self.info = info or probe_video(path)
+        # size=(w, h): ffmpeg сам уменьшает кадры (превью, прокси), по пайпу идет уже маленький кадр
+        # step=N: отдается каждый N-й кадр, начиная со start_frame (остальные даже не копируются в пайп)
+        self.width, self.height = size or (self.info["width"], self.info["height"])
+        self.fps = self.info["fps"]
+        self.frame_size = self.width * self.height * 3
+
+        cmd = [FFMPEG_BINARY, "-loglevel", "error"]
+        if start_frame > 0:
+            # -ss перед -i: быстрый переход к ключевому кадру, дальше ffmpeg
+            # докодирует до нужного кадра сам. Полкадра запаса от ошибок округления.
+            cmd += ["-ss", f"{(start_frame - 0.5) / self.fps:.6f}"]
+        # -vsync 0: отдаем кадры как есть, без дублей после -ss
+        cmd += ["-i", path, "-vsync", "0"]
+        filters = []
+        if step > 1:
+            filters.append(f"framestep={step}")
+        if size:
+            filters.append(f"scale={self.width}:{self.height}:flags=area")
+        if filters:
+            cmd += ["-vf", ",".join(filters)]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                     bufsize=self.frame_size)
+
+    def read(self, out):
+        # out - массив (h, w, 3) uint8, в него пишем кадр без промежуточных копий
+        view = memoryview(out).cast("B")
+        got = 0
+        while got < self.frame_size:
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.proc.stdout.close()
+        self.proc.terminate()
+        self.proc.wait()
+        self.proc = None
+
+class OpenCVReader:
+    """То же самое через cv2.VideoCapture (если ffmpeg недоступен)."""
+
+    def __init__(self, path, info=None, start_frame=0):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Не удалось открыть видео: {path}")
+        if start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        if info is None:
+            try:
+                info = probe_video(path)
+            except (IOError, OSError):
+                info = {
+                    "width": self.width,
+                    "height": self.height,
+                    "fps": self.fps,
+                    "n_frames": int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                    "has_audio": False,
+                }
+        self.info = info
+
+    def read(self, out):
+        ok, _ = self.cap.read(out)
+        return ok
+
+    def close(self):
+        self.cap.release()
+
+def open_reader(path, decoder="ffmpeg", info=None, start_frame=0):
+    if decoder == "opencv":
+        return OpenCVReader(path, info, start_frame)
+    return FFmpegReader(path, info, start_frame)
+
+# --- Запись кадров ---
+# Настройки энкодера - словарь (см. encoder_from_config):
+#   codec, preset, crf, bitrate, threads, pix_fmt - как у ffmpeg (None/0/"" = по умолчанию)
+#   draft - черновик: ultrafast и только ключевые кадры, кодируется в разы быстрее
+#   audio - "aac" (перекодировать), "copy" (дорожка исходника как есть) или "none"
+DEFAULT_ENCODER = {
+    "codec": "libx264", "preset": None, "crf": None, "bitrate": None,
+    "threads": 0, "pix_fmt": "yuv420p", "draft": False, "audio": "aac",
+}
+
+def encoder_from_config(config):
+    return {
+        "codec": config.get("VIDEO_CODEC", "libx264"),
+        "preset": config.get("PRESET"),
+        "crf": config.get("CRF"),
+        "bitrate": config.get("BITRATE"),
+        "threads": config.get("ENCODER_THREADS", 0),
+        "pix_fmt": config.get("PIX_FMT", "yuv420p"),
+        "draft": config.get("DRAFT", False),
+        "audio": config.get("AUDIO_MODE", "aac"),
+    }
+
+def video_args(encoder):
+    encoder = dict(DEFAULT_ENCODER, **(encoder or {}))
+    args = ["-c:v", encoder["codec"]]
+    preset = "ultrafast" if encoder["draft"] else encoder["preset"]
+    if preset:
+        args += ["-preset", preset]
+    if encoder["draft"]:
+        args += ["-g", "1"]
+    if encoder["bitrate"]:
+        args += ["-b:v", str(encoder["bitrate"])]
+    elif encoder["crf"] is not None:
+        args += ["-crf", str(encoder["crf"])]
+    if encoder["threads"]:
+        args += ["-threads", str(encoder["threads"])]
+    if encoder["pix_fmt"]:
+        args += ["-pix_fmt", encoder["pix_fmt"]]
+    return args
+
+def audio_args(encoder, input_index=1):
+    """Аргументы для звука из входа input_index; None, если звук не нужен."""
+    mode = dict(DEFAULT_ENCODER, **(encoder or {}))["audio"]
+    if mode == "none":
+        return None
+    return ["-map", "0:v:0", "-map", f"{input_index}:a:0?", "-c:a", "copy" if mode == "copy" else "aac"]
+
+class FFmpegWriter:
+    """Пишет сырые BGR кадры в пайп энкодера ffmpeg. Звук берется из audio_source."""
+
+    def __init__(self, path, width, height, fps, audio_source=None, encoder=None, audio_start=0.0):
+        self.path = path
+        cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24",
+               "-s", f"{width}x{height}", "-r", f"{fps}", "-i", "-"]
+        audio = audio_args(encoder) if audio_source else None
+        if audio:
+            # audio_start: звук с этой секунды исходника (рендер фрагмента)
+            if audio_start > 0:
+                cmd += ["-ss", f"{audio_start:.6f}"]
+            cmd += ["-i", audio_source] + audio
+        cmd += video_args(encoder) + ["-shortest", path]
+
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(memoryview(frame).cast("B"))
+        except BrokenPipeError:
+            raise IOError(f"ffmpeg завершился с ошибкой: {self._error()}")
+
+    def _error(self):
+        self.proc.wait()
+        return self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.proc.stdin.close()
+        code = self.proc.wait()
+        err = self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+        self.proc.stderr.close()
+        self.proc = None
+        if code != 0:
+            raise IOError(f"ffmpeg завершился с ошибкой: {err}")
+
+# --- Потоковый рендер ---
+class RenderCancelled(Exception):
+    """Рендер остановлен пользователем (cancel.set())."""
+
+def stream_video(input_path, output_path, frame_fn, logger=None, decoder="ffmpeg", profiler=None, cancel=None,
+                 encoder=None):
+    """
+    Декодирует input_path, вызывает frame_fn(frame, t) для каждого кадра
+    (рисовать нужно прямо в frame) и кодирует результат в output_path.
+    profiler (profiling.Profiler) получает время декодирования и кодирования каждого кадра.
+    cancel (threading.Event) останавливает рендер: недописанный файл удаляется, летит RenderCancelled.
+    """
+    reader = open_reader(input_path, decoder)
+    info = reader.info
+    audio_source = input_path if info.get("has_audio") else None
+    writer = None
+    try:
+        writer = FFmpegWriter(output_path, reader.width, reader.height, reader.fps, audio_source, encoder)
+        frame = np.empty((reader.height, reader.width, 3), np.uint8)
+        if logger is not None:
+            logger(t__total=max(info.get("n_frames", 0), 1))
+        if profiler is not None:
+            profiler.begin(info.get("n_frames", 0))
+
+        index = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                break
+            start = time.perf_counter()
+            if not reader.read(frame):
+                break
+            decoded = time.perf_counter()
+            frame_fn(frame, index / reader.fps)
+            drawn = time.perf_counter()
+            writer.write(frame)
+            if profiler is not None:
+                profiler.frame(index, decoded - start, time.perf_counter() - drawn)
+            index += 1
+            if logger is not None:
+                logger(t__index=index)
+    finally:
+        reader.close()
+        if writer is not None:
+            writer.close()
+    if cancel is not None and cancel.is_set():
+        os.remove(output_path)
+        raise RenderCancelled()
+    return index
+
+# --- Склейка сегментов ---
+def concat_segments(segment_paths, output_path, audio_source=None, encoder=None):
+    """Склеивает сегменты без перекодирования видео и один раз подмешивает звук (encoder["audio"])."""
+    list_path = output_path + ".segments.txt"
+    with open(list_path, "w", encoding="utf8") as f:
+        for p in segment_paths:
+            escaped = os.path.abspath(p).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error",
+           "-f", "concat", "-safe", "0", "-i", list_path]
+    audio = audio_args(encoder) if audio_source else None
+    if audio:
+        cmd += ["-i", audio_source] + audio + ["-shortest"]
+    cmd += ["-c:v", "copy", output_path]
+
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if proc.returncode != 0:
+        raise IOError(f"ffmpeg не смог склеить сегменты: {proc.stderr.decode('utf8', errors='ignore').strip()}")
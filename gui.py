@@ -1,40 +1,124 @@
+import time
+STARTUP_T0 = time.perf_counter()  # для замера времени до появления окна (bench.py --startup)
+
 import tkinter as tk
 from tkinter import filedialog, ttk
-import test as trackingboxes
+from defaults import DEFAULT_CONFIG
+import renderqueue
 import threading
-import cv2
 import sv_ttk
 import math
 import os
 import subprocess
 import platform
 
-# --- Функция запуска ---
-def run_processing(config, input_path, output_path):
-    try:
-        progress_bar['mode'] = 'determinate'
-        trackingboxes.run_video_processing(config, input_path, output_path, progress_callback=update_progress)
+# --- Движок ---
+# test.py (cv2, numpy, ffmpeg_io...) не импортируем при старте: окно появляется сразу,
+# а движок подгружается фоновым потоком, пока заполняется форма. Потом он остается
+# загруженным, и следующие рендеры не платят за импорт еще раз.
+def load_engine():
+    import test as trackingboxes
+    import ffmpeg_io
+    import preview
+    return trackingboxes
+
+def preload_engine():
+    threading.Thread(target=load_engine, daemon=True).start()
+
+def startup_probe():
+    # BREAKCORE_STARTUP_PROBE=1: печатаем время до окна и выходим (замер в bench.py)
+    root.update()
+    print(f"window {time.perf_counter() - STARTUP_T0:.4f}", flush=True)
+    root.destroy()
+
+# --- Рендер через очередь ---
+# Любой рендер (и кнопка "ЗАПУСТИТЬ РЕНДЕР", и вкладка "Очередь") идет через
+# renderqueue.RenderQueue. Потоки рендера Tk не трогают: их события забирает
+# poll_render_queue из root.after раз в QUEUE_POLL_MS.
+QUEUE_POLL_MS = 100
+STATUS_TEXT = {"queued": "в очереди", "running": "идет", "done": "готово", "failed": "ошибка",
+               "cancelled": "отменено"}
+
+render_queue = None  # создается при первом рендере
+main_job = None      # задание кнопки запуска: за ним следят статус, прогресс и панель статистики
+
+def get_render_queue():
+    global render_queue
+    if render_queue is None:
+        render_queue = renderqueue.RenderQueue(int(queue_workers_var.get()))
+    return render_queue
+
+def cancel_processing():
+    if main_job is not None:
+        render_queue.cancel(main_job)
+    cancel_button.config(state=tk.DISABLED)
+    status_label.config(text="Останавливаю...", foreground="orange")
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def show_stats(snap):
+    stats_main_var.set(f"{snap['fps']:.1f} кадр/с   осталось {format_eta(snap['eta'])}   "
+                       f"кадр {snap['frames']}/{snap['total'] or '?'}   объектов {snap['trackers']}   "
+                       f"переобнаружений {snap['redetections']}")
+    stages = snap['stages_ms']
+    stats_stages_var.set("   ".join(f"{name} {value:.1f} мс" for name, value in stages.items()) or "-")
+
+def show_main_status(job, status):
+    if status == "queued":
+        status_label.config(text="Ждет свободного места в очереди...", foreground="orange")
+        return
+    if status == "running":
+        status_label.config(text="Обработка видео... Пожалуйста, подождите.", foreground="orange")
+        return
+    if status == "done":
         status_label.config(text="Готово! Видео сохранено.", foreground="#88ff88") # light green
         open_btn.config(state=tk.NORMAL)
-    except Exception as e:
-        status_label.config(text=f"Ошибка: {e}", foreground="#ff8888")
-    finally:
-        start_button.config(state=tk.NORMAL)
-        progress_bar.stop()
-
-def update_progress(value=0, **kwargs):
-    if isinstance(value, (int, float)):
-        progress_var.set(value)
-
-def start_processing_thread():
-    input_path = input_path_var.get()
-    output_path = output_path_var.get()
-    
-    if not os.path.exists(input_path):
-        status_label.config(text="Ошибка: Исходный файл не найден!", foreground="#ff8888")
-        return
-
-    config = trackingboxes.DEFAULT_CONFIG.copy()
+    elif status == "cancelled":
+        if job.config.get('RESUMABLE'):
+            status_label.config(text="Отменено. Готовые части сохранены, запуск продолжит рендер.", foreground="orange")
+        else:
+            status_label.config(text="Отменено.", foreground="orange")
+    else:
+        status_label.config(text=f"Ошибка: {job.error}", foreground="#ff8888")
+    start_button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+
+def update_queue_row(job, kind, value):
+    iid = str(job.id)
+    if not queue_tree.exists(iid):
+        queue_tree.insert("", "end", iid=iid, values=(os.path.basename(job.input_path),
+                                                     os.path.basename(job.output_path), "", "", ""))
+    if kind == "status":
+        queue_tree.set(iid, "status", STATUS_TEXT[value] + (f": {job.error}" if job.error else ""))
+        if value == "done":
+            queue_tree.set(iid, "progress", "100%")
+    elif kind == "progress":
+        queue_tree.set(iid, "progress", f"{value:.0f}%")
+    elif kind == "stats":
+        queue_tree.set(iid, "fps", f"{value['fps']:.1f}")
+
+def poll_render_queue():
+    # единственное место, где события рендеров попадают в Tk
+    if render_queue is not None:
+        for job, kind, value in render_queue.poll():
+            update_queue_row(job, kind, value)
+            if job is not main_job:
+                continue
+            if kind == "progress":
+                progress_var.set(value)
+            elif kind == "stats":
+                show_stats(value)
+            else:
+                show_main_status(job, value)
+    root.after(QUEUE_POLL_MS, poll_render_queue)
+
+def build_config():
+    """Конфиг из полей формы; при ошибке пишет ее в статус и возвращает None."""
+    config = DEFAULT_CONFIG.copy()
     
     # Обработка слов
     raw_words = words_var.get()
@@ -42,7 +126,7 @@ def start_processing_thread():
     
     if not word_list:
         status_label.config(text="Ошибка: Введите хотя бы одно слово!", foreground="#ff8888")
-        return
+        return None
 
     try:
         config.update({
@@ -56,26 +140,182 @@ def start_processing_thread():
             "LINE_THICKNESS": int(line_thickness_var.get()),
             "THRESHOLD": float(threshold_var.get()),
             "WORDS": word_list, # Передаем новый список слов
+            "TRACK_CACHE": track_cache_var.get(),
+            "RESUMABLE": resumable_var.get(),
+            "DRAFT": draft_var.get(),
+            "AUDIO_MODE": audio_mode_var.get(),
+            "SCENE_CUT": scene_cut_var.get(),
+            "AUDIO_REACTIVE": audio_reactive_var.get(),
+            "SEGMENT_CACHE": segment_cache_var.get(),
+            "IN_POINT": float(in_point_var.get() or 0),
+            "OUT_POINT": float(out_point_var.get()) if out_point_var.get().strip() else None,
+            "PROXY_WIDTH": 0 if proxy_var.get() == "полный" else int(proxy_var.get()),
+            "FPS_DIVISOR": int(fps_divisor_var.get()),
         })
-    except ValueError:
+    except (ValueError, tk.TclError):
         status_label.config(text="Ошибка: Проверьте числовые поля!", foreground="#ff8888")
+        return None
+
+    return load_engine().tracking_params(config)
+
+def job_from_form():
+    """(вход, выход, конфиг) из формы или None, если что-то не так (ошибка уже в статусе)."""
+    input_path = input_path_var.get()
+    output_path = output_path_var.get()
+
+    if not os.path.exists(input_path):
+        status_label.config(text="Ошибка: Исходный файл не найден!", foreground="#ff8888")
+        return None
+
+    config = build_config()
+    if config is None:
+        return None
+    return input_path, output_path, config
+
+def start_processing_thread():
+    form = job_from_form()
+    if form is None:
         return
 
-    config['feature_params'] = dict(
-        maxCorners=config['MAX_TRACKERS'],
-        qualityLevel=1.0 - config['THRESHOLD'] + 0.01,
-        minDistance=8,
-        blockSize=7
-    )
-    config['lk_params'] = dict(winSize=(15, 15), maxLevel=2, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+    global main_job
+    main_job = get_render_queue().submit(*form)
 
-    status_label.config(text="Обработка видео... Пожалуйста, подождите.", foreground="orange")
     start_button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
     open_btn.config(state=tk.DISABLED)
     progress_var.set(0)
-    
-    processing_thread = threading.Thread(target=run_processing, args=(config, input_path, output_path))
-    processing_thread.start()
+    stats_main_var.set("-")
+    stats_stages_var.set("-")
+
+def enqueue_job():
+    form = job_from_form()
+    if form is None:
+        return
+    get_render_queue().submit(*form)
+    status_label.config(text=f"Добавлено в очередь: {os.path.basename(form[1])}", foreground="#e0e0e0")
+
+def cancel_selected_jobs():
+    if render_queue is None:
+        return
+    selected = set(queue_tree.selection())
+    for job in render_queue.jobs:
+        if str(job.id) in selected:
+            render_queue.cancel(job)
+
+def clear_finished_jobs():
+    if render_queue is None:
+        return
+    for job in render_queue.jobs:
+        if job.status in ("done", "failed", "cancelled") and queue_tree.exists(str(job.id)):
+            queue_tree.delete(str(job.id))
+
+def on_queue_workers_change(*args):
+    if render_queue is None:
+        return
+    try:
+        render_queue.set_limit(int(queue_workers_var.get()))
+    except (ValueError, tk.TclError):
+        pass
+
+def on_close():
+    # недорисованные рендеры останавливаем, иначе процесс ждал бы их до конца
+    if render_queue is not None:
+        render_queue.shutdown()
+    root.destroy()
+
+# --- Живое превью ---
+preview_worker = None
+preview_photo = None      # ссылка на PhotoImage, иначе Tk ее выбросит
+preview_update_job = None
+
+def frame_to_photo(frame):
+    # BGR кадр -> PPM в памяти -> PhotoImage (без PIL)
+    h, w = frame.shape[:2]
+    header = f"P6 {w} {h} 255\n".encode()
+    return tk.PhotoImage(data=header + frame[:, :, ::-1].tobytes(), format="PPM")
+
+def show_preview_frame(frame):
+    global preview_photo
+    preview_photo = frame_to_photo(frame)
+    preview_image.config(image=preview_photo)
+
+def toggle_preview():
+    global preview_worker
+    if preview_worker is not None and preview_worker.running:
+        preview_worker.stop()
+        preview_button.config(text="▶ Превью")
+        update_scrub_range()
+        return
+
+    input_path = input_path_var.get()
+    if not os.path.exists(input_path):
+        status_label.config(text="Ошибка: Исходный файл не найден!", foreground="#ff8888")
+        return
+    config = build_config()
+    if config is None:
+        return
+    if preview_worker is None or preview_worker.input_path != input_path:
+        try:
+            load_engine()
+            import preview
+            preview_worker = preview.PreviewWorker(input_path, config)
+        except (IOError, OSError) as e:
+            status_label.config(text=f"Ошибка превью: {e}", foreground="#ff8888")
+            return
+    else:
+        preview_worker.set_config(config)
+    preview_worker.start()
+    preview_button.config(text="■ Пауза")
+    root.after(40, refresh_preview)
+
+def refresh_preview():
+    # опрос фонового потока превью из потока Tk
+    if preview_worker is None or not preview_worker.running:
+        return
+    latest = preview_worker.latest
+    if latest is not None:
+        index, frame = latest
+        show_preview_frame(frame)
+        preview_info_var.set(f"кадр {index}   пропущено {preview_worker.dropped}")
+    root.after(40, refresh_preview)
+
+def update_scrub_range():
+    span = preview_worker.ring_range() if preview_worker is not None else None
+    if span is None:
+        return
+    scrub_scale.config(from_=span[0], to=span[1])
+    scrub_var.set(span[1])
+
+def on_scrub(value):
+    # листать можно на паузе: кадры берутся из кольцевого буфера
+    if preview_worker is None or preview_worker.running:
+        return
+    index = int(float(value))
+    frame = preview_worker.frame_at(index)
+    if frame is not None:
+        show_preview_frame(frame)
+        preview_info_var.set(f"кадр {index} (буфер)")
+
+def schedule_preview_update(*args):
+    # настройки меняются по символу, применяем с небольшой задержкой
+    global preview_update_job
+    if preview_worker is None:
+        return
+    if preview_update_job is not None:
+        root.after_cancel(preview_update_job)
+    preview_update_job = root.after(300, apply_preview_config)
+
+def apply_preview_config():
+    global preview_update_job
+    preview_update_job = None
+    config = build_config()
+    if config is None:
+        return
+    preview_worker.set_config(config)
+    if preview_worker.running:
+        # продолжим с того же кадра: перезапуск трекера делает сам воркер
+        return
+    on_scrub(scrub_var.get())
 
 def open_result_file():
     path = output_path_var.get()
@@ -132,140 +372,247 @@ def update_previews(*args):
 def update_entry_from_slider(val):
     threshold_var.set(f"{float(val):.2f}")
 
-# --- GUI SETUP ---
-root = tk.Tk()
-root.title("Breakcore Visualizer GUI")
-root.geometry("700x650") # Чуть увеличил высоту
-sv_ttk.set_theme("dark")
-
-# Данные
-defaults = trackingboxes.DEFAULT_CONFIG
-input_path_var = tk.StringVar(value=os.path.join("исходники", "мск.mp4"))
-output_path_var = tk.StringVar(value=os.path.join("результ", "output.mp4"))
-shape_var = tk.StringVar(value=defaults["SHAPE"])
-star_points_var = tk.StringVar(value=defaults["STAR_POINTS"])
-max_trackers_var = tk.StringVar(value=defaults["MAX_TRACKERS"])
-lifespan_min_var = tk.StringVar(value=defaults["OBJ_LIFESPAN_MIN"])
-lifespan_max_var = tk.StringVar(value=defaults["OBJ_LIFESPAN_MAX"])
-size_min_var = tk.StringVar(value=defaults["OBJ_SIZE_MIN"])
-size_max_var = tk.StringVar(value=defaults["OBJ_SIZE_MAX"])
-line_thickness_var = tk.StringVar(value=defaults["LINE_THICKNESS"])
-threshold_var = tk.DoubleVar(value=defaults.get("THRESHOLD", 0.7))
-words_var = tk.StringVar(value=", ".join(defaults["WORDS"])) # Новая переменная для слов
-progress_var = tk.DoubleVar(value=0)
-
-# Триггеры обновлений
-for var in (shape_var, size_min_var, size_max_var, star_points_var):
-    var.trace_add("write", update_previews)
-
-# --- ВЕРХНЯЯ ЧАСТЬ (Файлы) ---
-file_frame = ttk.LabelFrame(root, text="Файлы", padding=10)
-file_frame.pack(fill="x", padx=10, pady=5)
-
-ttk.Label(file_frame, text="Вход:").grid(row=0, column=0, sticky="w")
-ttk.Entry(file_frame, textvariable=input_path_var).grid(row=0, column=1, sticky="ew", padx=5)
-ttk.Button(file_frame, text="📂", width=3, command=select_input_file).grid(row=0, column=2)
-
-ttk.Label(file_frame, text="Выход:").grid(row=1, column=0, sticky="w")
-ttk.Entry(file_frame, textvariable=output_path_var).grid(row=1, column=1, sticky="ew", padx=5)
-ttk.Button(file_frame, text="📂", width=3, command=select_output_file).grid(row=1, column=2)
-file_frame.columnconfigure(1, weight=1)
-
-# --- ЦЕНТРАЛЬНАЯ ЧАСТЬ (Настройки) ---
-notebook = ttk.Notebook(root)
-notebook.pack(fill="both", expand=True, padx=10, pady=5)
-
-# Вкладка 1: Визуал
-visual_tab = ttk.Frame(notebook, padding=10)
-notebook.add(visual_tab, text="Визуал")
-
-# Левая колонка визуала
-v_left = ttk.Frame(visual_tab)
-v_left.pack(side="left", fill="both", expand=True)
-
-ttk.Label(v_left, text="Текст (через запятую):").pack(anchor="w", pady=(0,2))
-ttk.Entry(v_left, textvariable=words_var).pack(fill="x", pady=(0,10))
-
-ttk.Label(v_left, text="Фигура:").pack(anchor="w", pady=(0,2))
-ttk.Combobox(v_left, textvariable=shape_var, values=["star", "square"], state="readonly").pack(fill="x", pady=(0,10))
-
-ttk.Label(v_left, text="Лучей звезды:").pack(anchor="w", pady=(0,2))
-ttk.Entry(v_left, textvariable=star_points_var).pack(fill="x", pady=(0,10))
-
-ttk.Label(v_left, text="Толщина линий:").pack(anchor="w", pady=(0,2))
-ttk.Entry(v_left, textvariable=line_thickness_var).pack(fill="x", pady=(0,10))
-
-# Правая колонка визуала (Превью)
-v_right = ttk.LabelFrame(visual_tab, text="Предпросмотр размера", padding=10)
-v_right.pack(side="right", fill="both", expand=True, padx=(10,0))
-
-v_right.columnconfigure(0, weight=1)
-v_right.columnconfigure(1, weight=1)
-
-ttk.Label(v_right, text="Min").grid(row=0, column=0)
-ttk.Label(v_right, text="Max").grid(row=0, column=1)
-
-min_canvas = tk.Canvas(v_right, height=100, bg="#2b2b2b", highlightthickness=0)
-min_canvas.grid(row=1, column=0, sticky="ew", padx=2)
-max_canvas = tk.Canvas(v_right, height=100, bg="#2b2b2b", highlightthickness=0)
-max_canvas.grid(row=1, column=1, sticky="ew", padx=2)
-
-ttk.Label(v_right, text="Размер (px):").grid(row=2, column=0, columnspan=2, pady=(10,2))
-s_frame = ttk.Frame(v_right)
-s_frame.grid(row=3, column=0, columnspan=2)
-ttk.Entry(s_frame, textvariable=size_min_var, width=5).pack(side="left", padx=2)
-ttk.Label(s_frame, text="-").pack(side="left")
-ttk.Entry(s_frame, textvariable=size_max_var, width=5).pack(side="left", padx=2)
-
-
-# Вкладка 2: Поведение (Трекинг)
-logic_tab = ttk.Frame(notebook, padding=10)
-notebook.add(logic_tab, text="Настройки трекера")
-
-l_grid = ttk.Frame(logic_tab)
-l_grid.pack(fill="x")
-l_grid.columnconfigure(1, weight=1)
-
-ttk.Label(l_grid, text="Макс. объектов:").grid(row=0, column=0, sticky="w", pady=5)
-ttk.Entry(l_grid, textvariable=max_trackers_var).grid(row=0, column=1, sticky="ew", padx=10)
-
-ttk.Label(l_grid, text="Время жизни (сек):").grid(row=1, column=0, sticky="w", pady=5)
-l_lifespan = ttk.Frame(l_grid)
-l_lifespan.grid(row=1, column=1, sticky="ew", padx=10)
-ttk.Entry(l_lifespan, textvariable=lifespan_min_var, width=8).pack(side="left")
-ttk.Label(l_lifespan, text=" - ").pack(side="left")
-ttk.Entry(l_lifespan, textvariable=lifespan_max_var, width=8).pack(side="left")
-
-ttk.Label(l_grid, text="Чувствительность (Threshold):").grid(row=2, column=0, sticky="w", pady=(20, 5))
-l_thresh = ttk.Frame(l_grid)
-l_thresh.grid(row=2, column=1, sticky="ew", padx=10, pady=(20, 5))
-ttk.Scale(l_thresh, from_=0.0, to=1.0, variable=threshold_var, command=update_entry_from_slider).pack(side="left", fill="x", expand=True)
-ttk.Entry(l_thresh, textvariable=threshold_var, width=5).pack(side="left", padx=(5,0))
-ttk.Label(l_grid, text="(Больше = меньше мусора)").grid(row=3, column=1, sticky="w", padx=10, pady=0)
-
-
-# --- НИЖНЯЯ ЧАСТЬ (Контроль) ---
-bottom_frame = ttk.Frame(root, padding=15)
-bottom_frame.pack(fill="x", side="bottom")
-
-# Статус
-status_label = ttk.Label(bottom_frame, text="Готов к работе", font=("Segoe UI", 9))
-status_label.pack(anchor="w", pady=(0, 5))
-
-# Прогресс
-progress_bar = ttk.Progressbar(bottom_frame, variable=progress_var, mode='determinate')
-progress_bar.pack(fill="x", pady=(0, 10))
-
-# Кнопки
-btn_frame = ttk.Frame(bottom_frame)
-btn_frame.pack(fill="x")
-
-open_btn = ttk.Button(btn_frame, text="Открыть результат", state=tk.DISABLED, command=open_result_file)
-open_btn.pack(side="left")
-
-start_button = ttk.Button(btn_frame, text="ЗАПУСТИТЬ РЕНДЕР", style="Accent.TButton", command=start_processing_thread)
-start_button.pack(side="right")
-
-# Инициализация
-root.after(100, update_previews)
-root.mainloop()
\ No newline at end of file
+# Окно создаем только при запуске gui.py: дочерние процессы (spawn на Windows)
+# импортируют этот модуль заново и не должны открывать свое окно
+if __name__ == '__main__':
+    # --- GUI SETUP ---
+    root = tk.Tk()
+    root.title("Breakcore Visualizer GUI")
+    root.geometry("700x720") # Чуть увеличил высоту
+    sv_ttk.set_theme("dark")
+
+    # Данные
+    defaults = DEFAULT_CONFIG
+    input_path_var = tk.StringVar(value=os.path.join("исходники", "мск.mp4"))
+    output_path_var = tk.StringVar(value=os.path.join("результ", "output.mp4"))
+    shape_var = tk.StringVar(value=defaults["SHAPE"])
+    star_points_var = tk.StringVar(value=defaults["STAR_POINTS"])
+    max_trackers_var = tk.StringVar(value=defaults["MAX_TRACKERS"])
+    lifespan_min_var = tk.StringVar(value=defaults["OBJ_LIFESPAN_MIN"])
+    lifespan_max_var = tk.StringVar(value=defaults["OBJ_LIFESPAN_MAX"])
+    size_min_var = tk.StringVar(value=defaults["OBJ_SIZE_MIN"])
+    size_max_var = tk.StringVar(value=defaults["OBJ_SIZE_MAX"])
+    line_thickness_var = tk.StringVar(value=defaults["LINE_THICKNESS"])
+    threshold_var = tk.DoubleVar(value=defaults.get("THRESHOLD", 0.7))
+    words_var = tk.StringVar(value=", ".join(defaults["WORDS"])) # Новая переменная для слов
+    track_cache_var = tk.BooleanVar(value=defaults["TRACK_CACHE"])
+    resumable_var = tk.BooleanVar(value=defaults["RESUMABLE"])
+    draft_var = tk.BooleanVar(value=defaults["DRAFT"])
+    audio_mode_var = tk.StringVar(value=defaults["AUDIO_MODE"])
+    scene_cut_var = tk.BooleanVar(value=defaults["SCENE_CUT"])
+    audio_reactive_var = tk.BooleanVar(value=defaults["AUDIO_REACTIVE"])
+    segment_cache_var = tk.BooleanVar(value=defaults["SEGMENT_CACHE"])
+    in_point_var = tk.StringVar(value="")
+    out_point_var = tk.StringVar(value="")
+    proxy_var = tk.StringVar(value="полный")
+    fps_divisor_var = tk.StringVar(value=str(defaults["FPS_DIVISOR"]))
+    progress_var = tk.DoubleVar(value=0)
+    preview_info_var = tk.StringVar(value="")
+    scrub_var = tk.DoubleVar(value=0)
+    stats_main_var = tk.StringVar(value="-")
+    stats_stages_var = tk.StringVar(value="-")
+    queue_workers_var = tk.StringVar(value=str(renderqueue.default_workers()))
+    queue_workers_var.trace_add("write", on_queue_workers_change)
+
+    # Триггеры обновлений
+    for var in (shape_var, size_min_var, size_max_var, star_points_var):
+        var.trace_add("write", update_previews)
+    for var in (shape_var, size_min_var, size_max_var, star_points_var, max_trackers_var, lifespan_min_var,
+                lifespan_max_var, line_thickness_var, threshold_var, words_var, scene_cut_var, audio_reactive_var):
+        var.trace_add("write", schedule_preview_update)
+
+    # --- ВЕРХНЯЯ ЧАСТЬ (Файлы) ---
+    file_frame = ttk.LabelFrame(root, text="Файлы", padding=10)
+    file_frame.pack(fill="x", padx=10, pady=5)
+
+    ttk.Label(file_frame, text="Вход:").grid(row=0, column=0, sticky="w")
+    ttk.Entry(file_frame, textvariable=input_path_var).grid(row=0, column=1, sticky="ew", padx=5)
+    ttk.Button(file_frame, text="📂", width=3, command=select_input_file).grid(row=0, column=2)
+
+    ttk.Label(file_frame, text="Выход:").grid(row=1, column=0, sticky="w")
+    ttk.Entry(file_frame, textvariable=output_path_var).grid(row=1, column=1, sticky="ew", padx=5)
+    ttk.Button(file_frame, text="📂", width=3, command=select_output_file).grid(row=1, column=2)
+    file_frame.columnconfigure(1, weight=1)
+
+    # --- ЦЕНТРАЛЬНАЯ ЧАСТЬ (Настройки) ---
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill="both", expand=True, padx=10, pady=5)
+
+    # Вкладка 1: Визуал
+    visual_tab = ttk.Frame(notebook, padding=10)
+    notebook.add(visual_tab, text="Визуал")
+
+    # Левая колонка визуала
+    v_left = ttk.Frame(visual_tab)
+    v_left.pack(side="left", fill="both", expand=True)
+
+    ttk.Label(v_left, text="Текст (через запятую):").pack(anchor="w", pady=(0,2))
+    ttk.Entry(v_left, textvariable=words_var).pack(fill="x", pady=(0,10))
+
+    ttk.Label(v_left, text="Фигура:").pack(anchor="w", pady=(0,2))
+    ttk.Combobox(v_left, textvariable=shape_var, values=["star", "square"], state="readonly").pack(fill="x", pady=(0,10))
+
+    ttk.Label(v_left, text="Лучей звезды:").pack(anchor="w", pady=(0,2))
+    ttk.Entry(v_left, textvariable=star_points_var).pack(fill="x", pady=(0,10))
+
+    ttk.Label(v_left, text="Толщина линий:").pack(anchor="w", pady=(0,2))
+    ttk.Entry(v_left, textvariable=line_thickness_var).pack(fill="x", pady=(0,10))
+
+    # Правая колонка визуала (Превью)
+    v_right = ttk.LabelFrame(visual_tab, text="Предпросмотр размера", padding=10)
+    v_right.pack(side="right", fill="both", expand=True, padx=(10,0))
+
+    v_right.columnconfigure(0, weight=1)
+    v_right.columnconfigure(1, weight=1)
+
+    ttk.Label(v_right, text="Min").grid(row=0, column=0)
+    ttk.Label(v_right, text="Max").grid(row=0, column=1)
+
+    min_canvas = tk.Canvas(v_right, height=100, bg="#2b2b2b", highlightthickness=0)
+    min_canvas.grid(row=1, column=0, sticky="ew", padx=2)
+    max_canvas = tk.Canvas(v_right, height=100, bg="#2b2b2b", highlightthickness=0)
+    max_canvas.grid(row=1, column=1, sticky="ew", padx=2)
+
+    ttk.Label(v_right, text="Размер (px):").grid(row=2, column=0, columnspan=2, pady=(10,2))
+    s_frame = ttk.Frame(v_right)
+    s_frame.grid(row=3, column=0, columnspan=2)
+    ttk.Entry(s_frame, textvariable=size_min_var, width=5).pack(side="left", padx=2)
+    ttk.Label(s_frame, text="-").pack(side="left")
+    ttk.Entry(s_frame, textvariable=size_max_var, width=5).pack(side="left", padx=2)
+
+
+    # Вкладка 2: Поведение (Трекинг)
+    logic_tab = ttk.Frame(notebook, padding=10)
+    notebook.add(logic_tab, text="Настройки трекера")
+
+    l_grid = ttk.Frame(logic_tab)
+    l_grid.pack(fill="x")
+    l_grid.columnconfigure(1, weight=1)
+
+    ttk.Label(l_grid, text="Макс. объектов:").grid(row=0, column=0, sticky="w", pady=5)
+    ttk.Entry(l_grid, textvariable=max_trackers_var).grid(row=0, column=1, sticky="ew", padx=10)
+
+    ttk.Label(l_grid, text="Время жизни (сек):").grid(row=1, column=0, sticky="w", pady=5)
+    l_lifespan = ttk.Frame(l_grid)
+    l_lifespan.grid(row=1, column=1, sticky="ew", padx=10)
+    ttk.Entry(l_lifespan, textvariable=lifespan_min_var, width=8).pack(side="left")
+    ttk.Label(l_lifespan, text=" - ").pack(side="left")
+    ttk.Entry(l_lifespan, textvariable=lifespan_max_var, width=8).pack(side="left")
+
+    ttk.Label(l_grid, text="Чувствительность (Threshold):").grid(row=2, column=0, sticky="w", pady=(20, 5))
+    l_thresh = ttk.Frame(l_grid)
+    l_thresh.grid(row=2, column=1, sticky="ew", padx=10, pady=(20, 5))
+    ttk.Scale(l_thresh, from_=0.0, to=1.0, variable=threshold_var, command=update_entry_from_slider).pack(side="left", fill="x", expand=True)
+    ttk.Entry(l_thresh, textvariable=threshold_var, width=5).pack(side="left", padx=(5,0))
+    ttk.Label(l_grid, text="(Больше = меньше мусора)").grid(row=3, column=1, sticky="w", padx=10, pady=0)
+
+    ttk.Checkbutton(l_grid, text="Кэш трекинга (повторный рендер с другим визуалом без пересчета)",
+                    variable=track_cache_var).grid(row=4, column=0, columnspan=2, sticky="w", pady=(20, 5))
+    ttk.Checkbutton(l_grid, text="Рендер по частям (после сбоя или отмены продолжится с того же места)",
+                    variable=resumable_var).grid(row=5, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Checkbutton(l_grid, text="Черновик (быстрое кодирование, большой файл)",
+                    variable=draft_var).grid(row=6, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Label(l_grid, text="Звук:").grid(row=7, column=0, sticky="w", pady=5)
+    ttk.Combobox(l_grid, textvariable=audio_mode_var, values=["aac", "copy", "none"],
+                 state="readonly").grid(row=7, column=1, sticky="ew", padx=10)
+    ttk.Checkbutton(l_grid, text="Склейки (на смене плана трекеры начинаются заново)",
+                    variable=scene_cut_var).grid(row=8, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Checkbutton(l_grid, text="Реакция на звук (всплески объектов на ударах, размер и мерцание по громкости)",
+                    variable=audio_reactive_var).grid(row=9, column=0, columnspan=2, sticky="w", pady=5)
+    ttk.Checkbutton(l_grid, text="Кэш сегментов (повторный рендер пересчитывает только измененные куски)",
+                    variable=segment_cache_var).grid(row=10, column=0, columnspan=2, sticky="w", pady=5)
+
+    ttk.Label(l_grid, text="Фрагмент (сек, пусто = все):").grid(row=11, column=0, sticky="w", pady=(20, 5))
+    l_range = ttk.Frame(l_grid)
+    l_range.grid(row=11, column=1, sticky="ew", padx=10, pady=(20, 5))
+    ttk.Entry(l_range, textvariable=in_point_var, width=8).pack(side="left")
+    ttk.Label(l_range, text=" - ").pack(side="left")
+    ttk.Entry(l_range, textvariable=out_point_var, width=8).pack(side="left")
+
+    ttk.Label(l_grid, text="Прокси (ширина / каждый N-й кадр):").grid(row=12, column=0, sticky="w", pady=5)
+    l_proxy = ttk.Frame(l_grid)
+    l_proxy.grid(row=12, column=1, sticky="ew", padx=10)
+    ttk.Combobox(l_proxy, textvariable=proxy_var, values=["полный", "1280", "960", "640", "480"],
+                 width=8).pack(side="left")
+    ttk.Label(l_proxy, text=" / ").pack(side="left")
+    ttk.Combobox(l_proxy, textvariable=fps_divisor_var, values=["1", "2", "3", "4"], width=4,
+                 state="readonly").pack(side="left")
+
+
+    # Вкладка 3: Живое превью
+    preview_tab = ttk.Frame(notebook, padding=10)
+    notebook.add(preview_tab, text="Превью")
+
+    preview_image = ttk.Label(preview_tab, anchor="center")
+    preview_image.pack(fill="both", expand=True)
+
+    p_controls = ttk.Frame(preview_tab)
+    p_controls.pack(fill="x", pady=(5, 0))
+    preview_button = ttk.Button(p_controls, text="▶ Превью", width=10, command=toggle_preview)
+    preview_button.pack(side="left")
+    scrub_scale = ttk.Scale(p_controls, from_=0, to=0, variable=scrub_var, command=on_scrub)
+    scrub_scale.pack(side="left", fill="x", expand=True, padx=10)
+    ttk.Label(p_controls, textvariable=preview_info_var, width=24).pack(side="left")
+
+
+    # Вкладка 4: Очередь рендеров
+    queue_tab = ttk.Frame(notebook, padding=10)
+    notebook.add(queue_tab, text="Очередь")
+
+    q_controls = ttk.Frame(queue_tab)
+    q_controls.pack(fill="x", pady=(0, 5))
+    ttk.Button(q_controls, text="Добавить в очередь", command=enqueue_job).pack(side="left")
+    ttk.Button(q_controls, text="Отменить выбранные", command=cancel_selected_jobs).pack(side="left", padx=5)
+    ttk.Button(q_controls, text="Убрать завершенные", command=clear_finished_jobs).pack(side="left")
+    ttk.Spinbox(q_controls, from_=1, to=os.cpu_count() or 1, textvariable=queue_workers_var, width=4,
+                state="readonly").pack(side="right")
+    ttk.Label(q_controls, text="Одновременно:").pack(side="right", padx=5)
+
+    queue_tree = ttk.Treeview(queue_tab, columns=("input", "output", "status", "progress", "fps"),
+                              show="headings", height=8)
+    for column, title, width in (("input", "Вход", 140), ("output", "Выход", 140), ("status", "Статус", 160),
+                                 ("progress", "Готово", 60), ("fps", "кадр/с", 60)):
+        queue_tree.heading(column, text=title)
+        queue_tree.column(column, width=width, stretch=column == "status")
+    queue_tree.pack(fill="both", expand=True)
+
+
+    # --- НИЖНЯЯ ЧАСТЬ (Контроль) ---
+    bottom_frame = ttk.Frame(root, padding=15)
+    bottom_frame.pack(fill="x", side="bottom")
+
+    # Статус
+    status_label = ttk.Label(bottom_frame, text="Готов к работе", font=("Segoe UI", 9))
+    status_label.pack(anchor="w", pady=(0, 5))
+
+    # Прогресс
+    progress_bar = ttk.Progressbar(bottom_frame, variable=progress_var, mode='determinate')
+    progress_bar.pack(fill="x", pady=(0, 10))
+
+    # Живая статистика рендера (скорость, ETA, время по стадиям на кадр)
+    stats_frame = ttk.LabelFrame(bottom_frame, text="Производительность", padding=5)
+    stats_frame.pack(fill="x", pady=(0, 10))
+    ttk.Label(stats_frame, textvariable=stats_main_var, font=("Segoe UI", 9)).pack(anchor="w")
+    ttk.Label(stats_frame, textvariable=stats_stages_var, font=("Segoe UI", 9)).pack(anchor="w")
+
+    # Кнопки
+    btn_frame = ttk.Frame(bottom_frame)
+    btn_frame.pack(fill="x")
+
+    open_btn = ttk.Button(btn_frame, text="Открыть результат", state=tk.DISABLED, command=open_result_file)
+    open_btn.pack(side="left")
+
+    start_button = ttk.Button(btn_frame, text="ЗАПУСТИТЬ РЕНДЕР", style="Accent.TButton", command=start_processing_thread)
+    start_button.pack(side="right")
+
+    cancel_button = ttk.Button(btn_frame, text="Отмена", state=tk.DISABLED, command=cancel_processing)
+    cancel_button.pack(side="right", padx=(0, 10))
+
+    # Инициализация
+    root.after(100, update_previews)
+    root.after(50, preload_engine)
+    root.after(QUEUE_POLL_MS, poll_render_queue)
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    if os.environ.get("BREAKCORE_STARTUP_PROBE"):
+        root.after(0, startup_probe)
+    root.mainloop()
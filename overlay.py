@@ -0,0 +1,194 @@
+import random
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+import spatial
+
+# --- Пакетная отрисовка оверлея ---
+# Вершины всех звезд/квадратов считаются разом из заготовок, цвета - массивами,
+# а отрезки одного цвета уходят в OpenCV одним вызовом cv2.polylines.
+# Картинка та же, что у draw_star / draw_square из test.py.
+
+_star_templates = {}
+
+def star_template(star_points):
+    # единичная звезда: cos/sin углов вершин и какие вершины внешние; кэшируется по STAR_POINTS
+    template = _star_templates.get(star_points)
+    if template is None:
+        i = np.arange(2 * star_points)
+        angles = i * (np.pi / star_points) - np.pi / 2
+        template = (np.cos(angles), np.sin(angles), i % 2 == 0)
+        _star_templates[star_points] = template
+    return template
+
+def shimmer(t, creation_time, shimmer_phase):
+    return (np.sin((t - creation_time) * 4 + shimmer_phase) + 1) / 2
+
+def audio_shimmer(shimmers, onset, amount):
+    # тихо - мерцание затухает к середине, на ударе - полный размах
+    return 0.5 + (shimmers - 0.5) * ((1 - amount) + amount * onset)
+
+def star_segments(centers, sizes, star_points):
+    """Отрезки контуров всех звезд: (n_objects, 2 * star_points, 2, 2)."""
+    cos, sin, is_outer = star_template(star_points)
+    outer = sizes // 2
+    inner = outer // 2
+    radius = np.where(is_outer[None, :], outer[:, None], inner[:, None])
+    vertices = np.empty((len(centers), len(cos), 2), np.int32)
+    vertices[:, :, 0] = centers[:, 0:1] + radius * cos[None, :]
+    vertices[:, :, 1] = centers[:, 1:2] + radius * sin[None, :]
+    return np.stack([vertices, np.roll(vertices, -1, axis=1)], axis=2)
+
+def square_outlines(centers, sizes):
+    half = (sizes // 2)[:, None]
+    corners = np.empty((len(centers), 4, 2), np.int32)
+    corners[:, 0] = centers - half
+    corners[:, 1, 0] = centers[:, 0] + half[:, 0]
+    corners[:, 1, 1] = centers[:, 1] - half[:, 0]
+    corners[:, 2] = centers + half
+    corners[:, 3, 0] = centers[:, 0] - half[:, 0]
+    corners[:, 3, 1] = centers[:, 1] + half[:, 0]
+    return corners
+
+def draw_segments_by_gray(img, segments, grays, thickness):
+    # одна cv2.polylines на каждый оттенок серого
+    order = np.argsort(grays, kind="stable")
+    segments = segments[order]
+    grays = grays[order]
+    values, starts = np.unique(grays, return_index=True)
+    bounds = list(starts[1:]) + [len(grays)]
+    for gray, start, end in zip(values, starts, bounds):
+        color = (int(gray),) * 3
+        cv2.polylines(img, segments[start:end], False, color, thickness, lineType=cv2.LINE_AA)
+
+# --- Кэш подписей ---
+# WORDS - маленький фиксированный набор, поэтому каждую пару (слово, оттенок)
+# растеризуем через cv2.putText один раз, а дальше только смешиваем спрайт с кадром.
+# Мерцание дает много оттенков, поэтому они квантуются на TEXT_LEVELS уровней,
+# а сам кэш ограничен LRU.
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+SPRITE_PAD = 2
+
+class LabelCache:
+    def __init__(self, max_size=256, levels=32):
+        self.max_size = max_size
+        self.step = max(1, 256 // levels)
+        self.sprites = OrderedDict()
+        # кэш общий для всех рендеров процесса, а очередь GUI гоняет их в нескольких потоках
+        self.lock = threading.Lock()
+
+    def quantize(self, gray):
+        return min(255, int(round(gray / self.step)) * self.step)
+
+    def sprite(self, word, gray):
+        key = (word, gray)
+        with self.lock:
+            sprite = self.sprites.get(key)
+            if sprite is not None:
+                self.sprites.move_to_end(key)
+                return sprite
+
+        (w, h), baseline = cv2.getTextSize(word, FONT, FONT_SCALE, 1)
+        alpha = np.zeros((h + baseline + 2 * SPRITE_PAD, w + 2 * SPRITE_PAD), np.uint8)
+        cv2.putText(alpha, word, (SPRITE_PAD, SPRITE_PAD + h), FONT, FONT_SCALE, 255, 1, lineType=cv2.LINE_AA)
+        # заранее умноженный на альфу цвет и обратная альфа: смешивание без деления на каждый пиксель
+        alpha16 = alpha.astype(np.uint16)[:, :, None]
+        premultiplied = np.repeat(alpha16 * gray, 3, axis=2)
+        inverse = np.repeat(255 - alpha16, 3, axis=2)
+        # смещение левого верхнего угла спрайта относительно точки putText
+        sprite = (premultiplied, inverse, -SPRITE_PAD, -(SPRITE_PAD + h))
+        with self.lock:
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.max_size:
+                self.sprites.popitem(last=False)
+        return sprite
+
+    def draw(self, img, word, org, gray):
+        premultiplied, inverse, dx, dy = self.sprite(word, self.quantize(gray))
+        x0, y0 = org[0] + dx, org[1] + dy
+        sh, sw = inverse.shape[:2]
+        ih, iw = img.shape[:2]
+        # обрезаем спрайт по краям кадра
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x0 + sw, iw), min(y0 + sh, ih)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return
+        sx, sy = cx0 - x0, cy0 - y0
+        roi = img[cy0:cy1, cx0:cx1]
+        blended = roi * inverse[sy:sy + cy1 - cy0, sx:sx + cx1 - cx0]
+        blended += premultiplied[sy:sy + cy1 - cy0, sx:sx + cx1 - cx0]
+        blended += 127
+        roi[:] = blended // 255
+
+_label_caches = {}
+
+def label_cache(config):
+    key = (config.get('LABEL_CACHE_SIZE', 256), config.get('TEXT_LEVELS', 32))
+    cache = _label_caches.get(key)
+    if cache is None:
+        cache = _label_caches[key] = LabelCache(*key)
+    return cache
+
+def link_order(n, t, seed):
+    # С SEED порядок связей - чистая функция (SEED, время кадра): повтор рендера,
+    # перемотка и рендер по частям рисуют одинаково, общего состояния random нет.
+    # Без SEED - как раньше, глобальный random.
+    rng = random if seed is None else random.Random(f"{seed}:links:{t!r}")
+    return np.array(rng.sample(range(n), n))
+
+def draw_overlays(output_frame, objects, t, config, audio=None):
+    """audio - (onset, energy) в 0..1 для этого кадра (AUDIO_REACTIVE) или None."""
+    n = len(objects)
+    if n == 0:
+        return
+
+    centers = objects.points.astype(np.int32)
+    sizes = objects.size.astype(np.int64)
+    if audio:
+        sizes = (sizes * (1 + config.get('AUDIO_SIZE', 0.5) * audio[1])).astype(np.int64)
+    thickness = config['LINE_THICKNESS']
+
+    if config['SHAPE'] == 'star':
+        star_points = config['STAR_POINTS']
+        shimmers = shimmer(t, objects.creation_time, objects.shimmer_phase)
+        if audio:
+            shimmers = audio_shimmer(shimmers, audio[0], config.get('AUDIO_SHIMMER', 1.0))
+        segments = star_segments(centers, sizes, star_points)
+        n_edges = 2 * star_points
+        gradient = np.arange(n_edges) / n_edges * 55
+        grays = (120 + shimmers[:, None] * 80 + gradient[None, :]).astype(np.int32)
+        draw_segments_by_gray(output_frame, segments.reshape(-1, 2, 2), grays.ravel(), thickness)
+        text_grays = (155 + shimmers * 100).astype(np.int32)
+    elif config['SHAPE'] == 'square':
+        cv2.polylines(output_frame, square_outlines(centers, sizes), True, (200, 200, 200), thickness, lineType=cv2.LINE_AA)
+        text_grays = np.full(n, 200, np.int32)
+    else:
+        text_grays = np.full(n, 255, np.int32)
+
+    text_x = centers[:, 0] - sizes // 2
+    text_y = centers[:, 1] - sizes // 2 - 5
+    words = config['WORDS']
+    if config.get('LABEL_CACHE', True):
+        labels = label_cache(config)
+        for i in range(n):
+            labels.draw(output_frame, words[objects.word_index[i]], (int(text_x[i]), int(text_y[i])), int(text_grays[i]))
+    else:
+        for i in range(n):
+            gray = int(text_grays[i])
+            cv2.putText(output_frame, words[objects.word_index[i]], (int(text_x[i]), int(text_y[i])),
+                        FONT, FONT_SCALE, (gray, gray, gray), 1, lineType=cv2.LINE_AA)
+
+    if n > 1:
+        mode = config.get('LINK_MODE', 'random')
+        if mode == 'random':
+            order = link_order(n, t, config.get('SEED'))
+            pairs = centers[order[:(n // 2) * 2]].reshape(-1, 2, 2)
+        else:
+            # соседние объекты через сеточный индекс, без перебора всех пар
+            edges = spatial.link_pairs(objects.points, mode, config.get('LINK_K', 2), config.get('LINK_RADIUS', 150.0))
+            pairs = centers[edges]
+        if len(pairs):
+            cv2.polylines(output_frame, pairs, False, (100, 100, 100), thickness, lineType=cv2.LINE_AA)
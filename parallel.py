@@ -0,0 +1,179 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+import numpy as np
+import ffmpeg_io
+import scenes
+import trackcache
+import test as engine
+
+# --- Параллельный рендер по сегментам ---
+# Видео режется на N кусков (по возможности по склейкам), каждый кусок
+# рендерит свой процесс со своим трекером, потом сегменты склеиваются
+# без перекодирования и звук подмешивается один раз.
+
+_progress = None
+_cancel = None
+
+def _init_worker(progress_queue, cancel_event):
+    global _progress, _cancel
+    _progress = progress_queue
+    _cancel = cancel_event
+    # после fork у всех процессов одинаковое состояние random
+    random.seed(os.urandom(16))
+
+def plan_segments(n_frames, n_segments, cuts=(), snap=0.25):
+    """Границы сегментов [(start, end), ...]; границы сдвигаются на ближайшую склейку."""
+    n_segments = max(1, min(n_segments, n_frames))
+    seg_len = n_frames / n_segments
+    bounds = [0]
+    for k in range(1, n_segments):
+        ideal = int(round(k * seg_len))
+        near = [c for c in cuts if abs(c - ideal) <= seg_len * snap and c > bounds[-1]]
+        bound = min(near, key=lambda c: abs(c - ideal)) if near else ideal
+        if bound > bounds[-1]:
+            bounds.append(bound)
+    bounds.append(n_frames)
+    segments = list(zip(bounds[:-1], bounds[1:]))
+    # последний сегмент читаем до конца файла: n_frames из probe бывает неточным
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+def render_segment(config, input_path, info, start, end, output_path, warmup=0, progress=None, cancel=None,
+                   profiler=None, track_path=None):
+    """
+    Рендерит кадры [start, end) в output_path (без звука). Перед start трекер
+    прогревается на warmup кадрах без рисования, чтобы на стыке не было скачка.
+    cancel (threading.Event) прерывает рендер: недописанный файл удаляется.
+    profiler получает по записи на нарисованный кадр (номер кадра - от начала видео).
+    track_path (test.cached_track) - рисовать по треку из кэша, без трекинга и прогрева.
+    Возвращает (сколько кадров записано, время склеек внутри [start, end) в секундах).
+    """
+    # у каждого сегмента свое зерно, иначе все сегменты повторяли бы одни и те же объекты
+    seed = None if config.get('SEED') is None else f"{config['SEED']}:{start}"
+    if track_path is not None:
+        tracker = engine.ReplayRenderer(trackcache.TrackReplay(track_path), config)
+        warmup = 0
+    else:
+        tracker = engine.Tracker(config, seed)
+    engine.attach_audio(config, input_path, tracker)
+    if profiler is not None:
+        profiler.attach(tracker)
+    warm_start = max(0, start - warmup)
+    reader = ffmpeg_io.open_reader(input_path, config.get('DECODER', 'ffmpeg'), info, start_frame=warm_start)
+    writer = None
+    written = 0
+    try:
+        writer = ffmpeg_io.FFmpegWriter(output_path, reader.width, reader.height, reader.fps,
+                                        encoder=ffmpeg_io.encoder_from_config(config))
+        frame = np.empty((reader.height, reader.width, 3), np.uint8)
+        index = warm_start
+        while end is None or index < end:
+            if cancel is not None and cancel.is_set():
+                writer.close()
+                os.remove(output_path)
+                raise ffmpeg_io.RenderCancelled()
+            began = time.perf_counter()
+            if not reader.read(frame):
+                break
+            decoded = time.perf_counter()
+            t = index / reader.fps
+            if index < start:
+                tracker.update(frame, t)
+            else:
+                tracker.process(frame, t, in_place=True)
+                drawn = time.perf_counter()
+                writer.write(frame)
+                if profiler is not None:
+                    profiler.frame(index, decoded - began, time.perf_counter() - drawn)
+                written += 1
+                if progress is not None:
+                    progress(written)
+            index += 1
+    finally:
+        reader.close()
+        if writer is not None:
+            writer.close()
+    # склейки прогрева принадлежат предыдущему сегменту
+    return written, [t for t in tracker.cuts if t >= start / reader.fps]
+
+def _render_segment_job(args):
+    config, input_path, info, start, end, output_path, warmup, track_path = args
+
+    def report(_):
+        if _progress is not None:
+            _progress.put(1)
+
+    return render_segment(config, input_path, info, start, end, output_path, warmup, report, _cancel,
+                          track_path=track_path)
+
+def run_parallel_processing(config, input_video_path, output_video_path, logger=None, cancel=None):
+    info = ffmpeg_io.probe_video(input_video_path)
+    workers = config.get('WORKERS') or os.cpu_count() or 1
+
+    cuts = []
+    if config.get('SCENE_ALIGN', True) and workers > 1:
+        print("ищу склейки для границ сегментов...")
+        cuts = scenes.find_scene_cuts(input_video_path, config.get('SCENE_CUT_THRESHOLD', 5.0),
+                                      config.get('SCENE_CUT_HIST', 0.12))
+    segments = plan_segments(info['n_frames'], workers, cuts)
+    # звук анализируем до запуска процессов: сегменты возьмут огибающую из кэша
+    engine.attach_audio(config, input_video_path)
+    track_path = engine.cached_track(config, input_video_path)
+    print(f"сегментов: {len(segments)}, процессов: {workers}")
+
+    work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_video_path)))
+    segment_paths = [os.path.join(work_dir, f"segment_{i:04d}.mp4") for i in range(len(segments))]
+    warmup = config.get('WARMUP_FRAMES', 10)
+
+    ctx = multiprocessing.get_context()
+    progress_queue = ctx.Queue()
+    # cancel (threading.Event) живет только в этом процессе - процессам сегментов передаем свой флаг
+    cancel_event = ctx.Event()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(progress_queue, cancel_event)) as pool:
+            jobs = [(config, input_video_path, info, start, end, path, warmup, track_path)
+                    for (start, end), path in zip(segments, segment_paths)]
+            futures = [pool.submit(_render_segment_job, job) for job in jobs]
+            # бар создаем после запуска процессов, иначе его копии попадут в дочерние процессы
+            if logger is not None:
+                logger(t__total=max(info['n_frames'], 1))
+            done_frames = 0
+            pending = set(futures)
+            while pending:
+                if cancel is not None and cancel.is_set():
+                    # ждущие сегменты снимаем, запущенные остановятся на следующем кадре
+                    cancel_event.set()
+                    for f in futures:
+                        f.cancel()
+                    wait(futures)
+                    raise ffmpeg_io.RenderCancelled()
+                _, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+                reported = done_frames
+                try:
+                    while True:
+                        done_frames += progress_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                if logger is not None and done_frames != reported:
+                    logger(t__index=done_frames)
+                failed = [f for f in futures if f.done() and f.exception() is not None]
+                if failed:
+                    for f in futures:
+                        f.cancel()
+                    raise failed[0].exception()
+
+        audio_source = input_video_path if info['has_audio'] else None
+        ffmpeg_io.concat_segments(segment_paths, output_video_path, audio_source, ffmpeg_io.encoder_from_config(config))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    results = [f.result() for f in futures]
+    engine.export_cuts(config, [t for _, cuts in results for t in cuts])
+    return sum(written for written, _ in results)
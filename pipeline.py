@@ -0,0 +1,187 @@
+import os
+import threading
+import queue
+import time
+import numpy as np
+import ffmpeg_io
+
+# --- Конвейер: декодер -> трекинг/рисование -> энкодер ---
+# Каждая стадия в своем потоке, между ними ограниченные очереди.
+# OpenCV и пайпы ffmpeg отпускают GIL, поэтому стадии реально идут параллельно.
+
+_END = None
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0      # время полезной работы
+        self.starved = 0.0   # ждали входной кадр (стадия выше не успевает)
+        self.blocked = 0.0   # ждали место в выходной очереди (стадия ниже не успевает)
+
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "busy": round(self.busy, 4),
+            "starved": round(self.starved, 4),
+            "blocked": round(self.blocked, 4),
+        }
+
+class PipelineStats:
+    def __init__(self):
+        self.stages = {name: StageStats(name) for name in ("decode", "track", "encode")}
+        self.queue_fill = {"decoded": [], "drawn": []}
+        self.wall = 0.0
+
+    def bottleneck(self):
+        return max(self.stages.values(), key=lambda s: s.busy).name
+
+    def as_dict(self):
+        fps = self.stages["encode"].frames / self.wall if self.wall > 0 else 0.0
+        return {
+            "wall": round(self.wall, 4),
+            "fps": round(fps, 2),
+            "bottleneck": self.bottleneck(),
+            "stages": {name: s.as_dict() for name, s in self.stages.items()},
+            "queue_fill": {name: round(float(np.mean(v)), 2) if v else 0.0
+                           for name, v in self.queue_fill.items()},
+        }
+
+    def report(self):
+        d = self.as_dict()
+        print(f"конвейер: {d['fps']} fps, узкое место: {d['bottleneck']}")
+        for name, s in d["stages"].items():
+            print(f"  {name:7s} работа {s['busy']:.2f}s  ждал вход {s['starved']:.2f}s  ждал выход {s['blocked']:.2f}s")
+
+def _get(q, stats):
+    start = time.perf_counter()
+    item = q.get()
+    stats.starved += time.perf_counter() - start
+    return item
+
+def _put(q, item, stats):
+    start = time.perf_counter()
+    q.put(item)
+    stats.blocked += time.perf_counter() - start
+
+def stream_video_pipelined(input_path, output_path, frame_fn, logger=None, decoder="ffmpeg", queue_depth=4,
+                           profiler=None, cancel=None, encoder=None):
+    """
+    То же самое, что ffmpeg_io.stream_video, но декодирование, frame_fn и
+    кодирование идут в трех потоках. Возвращает (число кадров, PipelineStats).
+    profiler получает кадры из потока трекинга (decode/encode там видны только в PipelineStats).
+    """
+    reader = ffmpeg_io.open_reader(input_path, decoder)
+    info = reader.info
+    audio_source = input_path if info.get("has_audio") else None
+    writer = None
+    stats = PipelineStats()
+    errors = []
+    stop = threading.Event()
+
+    # Кадры не выделяются заново: крутится фиксированный пул буферов
+    free = queue.Queue()
+    for _ in range(2 * queue_depth + 2):
+        free.put(np.empty((reader.height, reader.width, 3), np.uint8))
+    decoded = queue.Queue(maxsize=queue_depth)
+    drawn = queue.Queue(maxsize=queue_depth)
+
+    def decode_stage():
+        s = stats.stages["decode"]
+        index = 0
+        try:
+            while not stop.is_set():
+                buf = _get(free, s)
+                start = time.perf_counter()
+                ok = reader.read(buf)
+                s.busy += time.perf_counter() - start
+                if not ok:
+                    break
+                _put(decoded, (index, buf), s)
+                s.frames += 1
+                index += 1
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            decoded.put(_END)
+
+    def encode_stage():
+        s = stats.stages["encode"]
+        try:
+            while True:
+                item = _get(drawn, s)
+                if item is _END:
+                    break
+                index, buf = item
+                if not stop.is_set():
+                    start = time.perf_counter()
+                    writer.write(buf)
+                    s.busy += time.perf_counter() - start
+                    s.frames += 1
+                    if logger is not None:
+                        logger(t__index=index + 1)
+                free.put(buf)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            # освобождаем стадии выше, чтобы они не зависли на очередях
+            while drawn.get() is not _END:
+                pass
+
+    try:
+        writer = ffmpeg_io.FFmpegWriter(output_path, reader.width, reader.height, reader.fps, audio_source, encoder)
+        if logger is not None:
+            logger(t__total=max(info.get("n_frames", 0), 1))
+        if profiler is not None:
+            profiler.begin(info.get("n_frames", 0))
+
+        wall_start = time.perf_counter()
+        threads = [threading.Thread(target=decode_stage, daemon=True),
+                   threading.Thread(target=encode_stage, daemon=True)]
+        for th in threads:
+            th.start()
+
+        # Трекинг идет в вызывающем потоке: состояние трекера не нужно делить
+        s = stats.stages["track"]
+        while True:
+            stats.queue_fill["decoded"].append(decoded.qsize())
+            stats.queue_fill["drawn"].append(drawn.qsize())
+            item = _get(decoded, s)
+            if item is _END:
+                break
+            index, buf = item
+            if cancel is not None and cancel.is_set() and not stop.is_set():
+                errors.append(ffmpeg_io.RenderCancelled())
+                stop.set()
+            if not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    frame_fn(buf, index / reader.fps)
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+                s.busy += time.perf_counter() - start
+                s.frames += 1
+                if profiler is not None:
+                    profiler.frame(index)
+            if stop.is_set():
+                free.put(buf)
+                continue
+            _put(drawn, item, s)
+        drawn.put(_END)
+
+        for th in threads:
+            th.join()
+        stats.wall = time.perf_counter() - wall_start
+    finally:
+        stop.set()
+        reader.close()
+        if writer is not None:
+            writer.close()
+
+    if errors:
+        if isinstance(errors[0], ffmpeg_io.RenderCancelled):
+            os.remove(output_path)
+        raise errors[0]
+    return stats.stages["encode"].frames, stats
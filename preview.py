@@ -0,0 +1,143 @@
+import copy
+import time
+import threading
+from collections import deque
+import numpy as np
+import ffmpeg_io
+import trackcache
+import test as engine
+from overlay import draw_overlays
+
+# --- Живое превью ---
+# Фоновый поток декодирует уменьшенный поток (ffmpeg сам масштабирует), гоняет
+# трекер и рисует оверлей. Чтобы идти в реальном времени, отстающие кадры
+# пропускаются (декодируются, но не трекаются). Последние декодированные кадры
+# вместе с объектами лежат в кольцевом буфере - по нему можно листать на паузе,
+# перерисовывая оверлей с текущими настройками.
+# Смена визуальных настроек применяется сразу; смена параметров трекинга
+# перезапускает трекер с текущего кадра (прогрев на кадрах из буфера).
+
+def preview_config(config, factor):
+    """Конфиг рендера, пересчитанный под уменьшенный кадр превью."""
+    config = engine.scale_config(config, factor)
+    # превью не перематывает трекер назад, снимки не нужны
+    config['CHECKPOINT_INTERVAL'] = 0
+    return config
+
+class PreviewWorker:
+    def __init__(self, input_path, config, max_width=480, ring_size=120):
+        self.input_path = input_path
+        self.info = ffmpeg_io.probe_video(input_path)
+        self.fps = self.info['fps']
+        self.factor = min(1.0, max_width / self.info['width'])
+        # четные размеры - так хочет scale в ffmpeg
+        self.size = (max(int(self.info['width'] * self.factor) // 2 * 2, 2),
+                     max(int(self.info['height'] * self.factor) // 2 * 2, 2))
+        self.ring = deque(maxlen=ring_size)  # (индекс, кадр, объекты)
+        self.lock = threading.Lock()
+        self.config = preview_config(config, self.factor)
+        self.latest = None                   # (индекс, готовый кадр) для GUI
+        self.position = 0
+        self.dropped = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.audio = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, position=None):
+        self.stop()
+        if position is not None:
+            self.position = position
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.position, self.config, self.stop_event),
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def set_config(self, config):
+        new = preview_config(config, self.factor)
+        tracking_changed = any(new.get(k) != self.config.get(k) for k in trackcache.TRACKING_KEYS)
+        self.config = new
+        if tracking_changed and self.running:
+            self.start(self.position)
+
+    def ring_range(self):
+        with self.lock:
+            if not self.ring:
+                return None
+            return self.ring[0][0], self.ring[-1][0]
+
+    def frame_at(self, index):
+        """Кадр из кольцевого буфера с оверлеем по текущим настройкам (для перемотки на паузе)."""
+        with self.lock:
+            entry = next((e for e in self.ring if e[0] == index), None)
+        if entry is None:
+            return None
+        index, frame, objects = entry
+        return self._render(frame, objects, index / self.fps)
+
+    def _render(self, frame, objects, t):
+        config = engine.config_at(self.config, t)
+        out = frame.copy()
+        if objects is not None:
+            draw_overlays(out, objects.styled(config), t, config, self.audio and self.audio.levels(t))
+        return out
+
+    def _warm_up(self, tracker, start):
+        # прогрев нового трекера на кадрах до start, которые еще лежат в буфере
+        with self.lock:
+            frames = [(i, f) for i, f, _ in self.ring if start - self.config.get('WARMUP_FRAMES', 10) <= i < start]
+        for i, frame in frames:
+            tracker.update(frame, i / self.fps)
+
+    def _new_tracker(self, config):
+        tracker = engine.Tracker(config)
+        self.audio = engine.attach_audio(config, self.input_path, tracker)
+        return tracker
+
+    def _run(self, start, config, stop_event):
+        tracker = self._new_tracker(config)
+        self._warm_up(tracker, start)
+        reader = ffmpeg_io.FFmpegReader(self.input_path, self.info, start_frame=start, size=self.size)
+        try:
+            index = start
+            clock = time.perf_counter()
+            objects = None
+            while not stop_event.is_set():
+                frame = np.empty((self.size[1], self.size[0], 3), np.uint8)
+                if not reader.read(frame):
+                    # конец файла - по кругу с начала
+                    reader.close()
+                    with self.lock:
+                        self.ring.clear()
+                    tracker = self._new_tracker(config)
+                    reader = ffmpeg_io.FFmpegReader(self.input_path, self.info, size=self.size)
+                    start = index = 0
+                    clock = time.perf_counter()
+                    continue
+                due = start + (time.perf_counter() - clock) * self.fps
+                t = index / self.fps
+                if index + 1 < due:
+                    # отстаем от реального времени: кадр только в буфер, без трекинга
+                    self.dropped += 1
+                else:
+                    tracker.update(frame, t)
+                    objects = copy.copy(tracker.objects)
+                    self.latest = (index, self._render(frame, objects, t))
+                    wait = (index + 1 - start) / self.fps - (time.perf_counter() - clock)
+                    if wait > 0:
+                        stop_event.wait(wait)
+                with self.lock:
+                    self.ring.append((index, frame, objects))
+                index += 1
+                self.position = index
+        finally:
+            reader.close()
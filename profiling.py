@@ -0,0 +1,110 @@
+import json
+import time
+import threading
+from collections import deque
+
+# --- Профилирование рендера ---
+# Profiler получает по записи на кадр: время стадий (decode / gray / lk / redetect /
+# draw / encode), число живых трекеров и было ли переобнаружение. Держит скользящее
+# окно последних кадров для живых счетчиков (fps, ETA, разбивка по стадиям),
+# вызывает подключенные хуки и по желанию пишет трассу в JSONL (запись на кадр).
+# snapshot() можно звать из другого потока (GUI).
+
+STAGES = ("decode", "gray", "lk", "redetect", "draw", "encode")
+
+class Profiler:
+    def __init__(self, window=50, trace_path=None):
+        self.records = deque(maxlen=max(window, 2))
+        self.hooks = []
+        self.trace = open(trace_path, "w", encoding="utf8") if trace_path else None
+        self.lock = threading.Lock()
+        self.source = None
+        self.total = 0
+        self.frames = 0
+        self.redetections = 0
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.start = None
+
+    def add_hook(self, fn):
+        """fn(record) вызывается после каждого кадра в потоке рендера."""
+        self.hooks.append(fn)
+
+    def attach(self, source):
+        # source - Tracker или ReplayRenderer: берем разницу их накопленных timings
+        self.source = source
+        self._last_timings = dict(source.timings)
+        redetector = getattr(source, "redetector", None)
+        self._last_detections = redetector.detections if redetector else 0
+
+    def begin(self, total):
+        self.total = total
+        self.start = time.perf_counter()
+
+    def frame(self, index, decode=None, encode=None):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        stages = {"decode": decode}
+        trackers = 0
+        redetected = False
+        source = self.source
+        if source is not None:
+            for name, value in source.timings.items():
+                stages[name] = value - self._last_timings.get(name, 0.0)
+            self._last_timings = dict(source.timings)
+            trackers = len(source.objects)
+            redetector = getattr(source, "redetector", None)
+            if redetector is not None:
+                redetected = redetector.detections != self._last_detections
+                self._last_detections = redetector.detections
+        stages["encode"] = encode
+
+        record = {"frame": index, "time": round(now - self.start, 6), "trackers": trackers,
+                  "redetected": redetected,
+                  "stages": {k: round(v, 6) for k, v in stages.items() if v is not None}}
+        with self.lock:
+            self.records.append((now, record))
+            self.frames += 1
+            self.redetections += redetected
+            for name, value in record["stages"].items():
+                self.totals[name] = self.totals.get(name, 0.0) + value
+        if self.trace is not None:
+            self.trace.write(json.dumps(record) + "\n")
+        for hook in self.hooks:
+            hook(record)
+
+    def snapshot(self):
+        """Живые счетчики: fps и время стадий по скользящему окну, ETA по fps окна."""
+        with self.lock:
+            records = list(self.records)
+            frames, total, redetections = self.frames, self.total, self.redetections
+        fps = 0.0
+        if len(records) > 1:
+            span = records[-1][0] - records[0][0]
+            fps = (len(records) - 1) / span if span > 0 else 0.0
+        stages_ms = {}
+        for _, record in records:
+            for name, value in record["stages"].items():
+                stages_ms[name] = stages_ms.get(name, 0.0) + value * 1000 / len(records)
+        eta = (total - frames) / fps if fps > 0 and total > frames else None
+        return {
+            "frames": frames,
+            "total": total,
+            "fps": fps,
+            "eta": eta,
+            "trackers": records[-1][1]["trackers"] if records else 0,
+            "redetections": redetections,
+            "stages_ms": {name: stages_ms[name] for name in STAGES if name in stages_ms},
+        }
+
+    def report(self):
+        busy = sum(self.totals.values())
+        if not busy:
+            return
+        parts = [f"{name} {value:.2f}с ({value / busy:.0%})" for name, value in self.totals.items() if value]
+        print(f"стадии: {', '.join(parts)}; переобнаружений: {self.redetections}")
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
@@ -0,0 +1,203 @@
+import math
+import cv2
+import numpy as np
+from spatial import GridIndex
+
+# --- Планировщик переобнаружения ---
+# REDETECT_MODE = "interval": как раньше - каждые REDETECTION_INTERVAL кадров по всему кадру.
+# REDETECT_MODE = "adaptive": поиск запускается, когда трекеры теряются (доля потерь
+# REDETECT_LOSS_RATE), копится ошибка потока (REDETECT_ERROR_BUDGET) или живых
+# осталось меньше половины найденных; фиксированного интервала нет. Ищем только в
+# клетках сетки REDETECT_GRID, где сейчас нет живых трекеров. Порог качества угла
+# при этом общий для кадра (qualityLevel от лучшего угла всего кадра, как в interval):
+# иначе в пустой клетке проходят слабые углы, LK их тут же теряет и поиск зацикливается.
+# В обоих режимах маска исключения - один переиспользуемый буфер, круги вокруг живых
+# трекеров выбиваются одной записью numpy (готовый "штамп" круга cv2.circle).
+# При SPAWN_MIN_DIST > 0 круги в маске не рисуются: кандидаты, которые ближе
+# SPAWN_MIN_DIST к живым трекерам, отсеиваются через сеточный индекс (spatial.py).
+
+class RedetectionScheduler:
+    def __init__(self, config):
+        self.config = config
+        self.adaptive = config.get('REDETECT_MODE', 'interval') == 'adaptive'
+        self.mask = None
+        self.stamp = None  # (радиус, dy, dx) пикселей залитого круга
+        # сколько раз искали новые точки за все время (для счетчиков профилировщика)
+        self.detections = 0
+        self.reset()
+
+    def reset(self):
+        self.frames_since = 0
+        self.count_after = 0
+        self.lost = 0
+        self.error = 0.0
+        self.forced = False
+
+    def state(self):
+        return (self.frames_since, self.count_after, self.lost, self.error, self.forced)
+
+    def restore(self, state):
+        self.frames_since, self.count_after, self.lost, self.error, self.forced = state
+
+    def force(self):
+        self.forced = True
+
+    def observe_flow(self, n_tracked, n_good, errors):
+        # вызывается после LK: сколько точек потеряли и какая у оставшихся ошибка
+        self.lost += n_tracked - n_good
+        if n_good > 0:
+            self.error += float(np.mean(errors))
+
+    def should_detect(self, n_alive, frame_count):
+        config = self.config
+        short = n_alive < config['MAX_TRACKERS'] // 2
+        if self.forced or (short and not self.adaptive):
+            return True
+        if not self.adaptive:
+            return frame_count % config['REDETECTION_INTERVAL'] == 0
+
+        self.frames_since += 1
+        if self.count_after == 0:
+            # пустой трекер (первый кадр или в прошлый раз ничего не нашли) ищет сразу
+            return short
+        # нехватка считается от того, сколько нашлось в прошлый раз: если сцена дает меньше
+        # MAX_TRACKERS углов, поиск на каждом кадре после истекшего объекта ничего не даст
+        if n_alive < min(config['MAX_TRACKERS'], self.count_after) // 2:
+            return True
+        if self.lost / self.count_after >= config.get('REDETECT_LOSS_RATE', 0.3):
+            return True
+        return self.error >= config.get('REDETECT_ERROR_BUDGET', 200.0)
+
+    def _mask(self, gray):
+        if self.mask is None or self.mask.shape != gray.shape:
+            self.mask = np.empty_like(gray)
+        return self.mask
+
+    def _clear_circles(self, mask, points, radius):
+        # то же, что cv2.circle(mask, (x, y), radius, 0, -1) для каждой точки, но одной записью
+        if self.stamp is None or self.stamp[0] != radius:
+            patch = np.zeros((2 * radius + 1, 2 * radius + 1), np.uint8)
+            cv2.circle(patch, (radius, radius), radius, 1, -1)
+            dy, dx = np.nonzero(patch)
+            self.stamp = (radius, dy - radius, dx - radius)
+        _, dy, dx = self.stamp
+        centers = points.astype(np.int32)
+        ys = (centers[:, 1:2] + dy).ravel()
+        xs = (centers[:, 0:1] + dx).ravel()
+        h, w = mask.shape
+        inside = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+        mask[ys[inside], xs[inside]] = 0
+
+    def _min_quality(self, gray, feature_params):
+        # абсолютный порог goodFeaturesToTrack, посчитанный по всему кадру
+        block = feature_params.get('blockSize', 3)
+        if feature_params.get('useHarrisDetector'):
+            quality = cv2.cornerHarris(gray, block, 3, feature_params.get('k', 0.04))
+        else:
+            quality = cv2.cornerMinEigenVal(gray, block, 3)
+        return float(quality.max()) * feature_params['qualityLevel'], quality
+
+    def detect(self, gray, points, feature_params, radius, free_slots, min_dist=0):
+        """
+        Новые точки (в координатах gray). points - живые трекеры в тех же координатах.
+        min_dist > 0 - минимальное расстояние до живых трекеров и между новыми точками.
+        """
+        if min_dist > 0:
+            radius = 0
+            feature_params = dict(feature_params, minDistance=max(feature_params.get('minDistance', 1), min_dist))
+        if self.adaptive:
+            found = self._detect_tiles(gray, points, feature_params, radius, free_slots)
+        else:
+            mask = self._mask(gray)
+            mask.fill(1)
+            if radius > 0 and len(points):
+                self._clear_circles(mask, points, radius)
+            found = cv2.goodFeaturesToTrack(gray, mask=mask, **feature_params)
+            found = np.empty((0, 2), np.float32) if found is None else found.reshape(-1, 2)
+        if min_dist > 0 and len(points) and len(found):
+            found = found[~GridIndex(points, min_dist).any_within(found, min_dist)]
+
+        self.detections += 1
+        self.frames_since = 0
+        self.lost = 0
+        self.error = 0.0
+        self.forced = False
+        self.count_after = len(points) + min(len(found), free_slots)
+        return found[:free_slots]
+
+    def _detect_tiles(self, gray, points, feature_params, radius, free_slots):
+        h, w = gray.shape
+        cols, rows = self.config.get('REDETECT_GRID', (4, 4))
+        xs = np.linspace(0, w, cols + 1).astype(np.int32)
+        ys = np.linspace(0, h, rows + 1).astype(np.int32)
+
+        occupied = np.zeros((rows, cols), bool)
+        if len(points):
+            tx = np.clip(np.searchsorted(xs, points[:, 0], side='right') - 1, 0, cols - 1)
+            ty = np.clip(np.searchsorted(ys, points[:, 1], side='right') - 1, 0, rows - 1)
+            occupied[ty, tx] = True
+        free_tiles = np.argwhere(~occupied)
+        if free_slots <= 0 or len(free_tiles) == 0:
+            return np.empty((0, 2), np.float32)
+
+        # Маска открыта только в свободных клетках; круги рисуем лишь для точек,
+        # которые задевают свободную клетку (внутри свободных клеток точек нет по определению)
+        mask = self._mask(gray)
+        mask.fill(0)
+        for ty, tx in free_tiles:
+            mask[ys[ty]:ys[ty + 1], xs[tx]:xs[tx + 1]] = 1
+        if len(points) and radius > 0:
+            near = np.zeros(len(points), bool)
+            for dy in (-radius, 0, radius):
+                for dx in (-radius, 0, radius):
+                    nx = np.clip(np.searchsorted(xs, points[:, 0] + dx, side='right') - 1, 0, cols - 1)
+                    ny = np.clip(np.searchsorted(ys, points[:, 1] + dy, side='right') - 1, 0, rows - 1)
+                    near |= ~occupied[ny, nx]
+            self._clear_circles(mask, points[near], radius)
+
+        # Углы выбираем как goodFeaturesToTrack, но по одной карте качества на весь кадр:
+        # порог qualityLevel - от лучшего угла кадра (не клетки, иначе в пустой клетке проходят
+        # слабые углы, LK их тут же теряет и поиск зацикливается), локальные максимумы 3x3
+        # внутри маски, дальше жадно по убыванию качества с minDistance.
+        # Каждой клетке - не больше равной доли свободных слотов, так новые объекты расходятся по кадру.
+        min_quality, quality = self._min_quality(gray, feature_params)
+        peaks = (quality >= min_quality) & (quality == cv2.dilate(quality, None)) & (mask > 0)
+        cy, cx = np.nonzero(peaks)
+        if len(cy) == 0:
+            return np.empty((0, 2), np.float32)
+        order = np.argsort(-quality[cy, cx], kind='stable')
+        cy, cx = cy[order], cx[order]
+        tiles = (np.searchsorted(ys, cy, side='right') - 1).clip(0, rows - 1) * cols + \
+                (np.searchsorted(xs, cx, side='right') - 1).clip(0, cols - 1)
+
+        per_tile = max(1, math.ceil(free_slots / len(free_tiles)))
+        taken = np.zeros(rows * cols, np.int32)
+        min_dist = float(feature_params.get('minDistance', 0))
+        cell = max(min_dist, 1.0)
+        grid = {}
+        found = []
+        deferred = []
+
+        def accept(x, y):
+            gx, gy = int(x // cell), int(y // cell)
+            if min_dist > 0 and any((x - px) ** 2 + (y - py) ** 2 < min_dist * min_dist
+                                    for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                                    for px, py in grid.get((gx + dx, gy + dy), ())):
+                return False
+            grid.setdefault((gx, gy), []).append((x, y))
+            found.append((x, y))
+            return True
+
+        for x, y, tile in zip(cx.tolist(), cy.tolist(), tiles.tolist()):
+            if taken[tile] >= per_tile:
+                deferred.append((x, y))
+            elif accept(x, y):
+                taken[tile] += 1
+            if len(found) >= free_slots:
+                break
+        # слоты клеток без углов (ровный фон) отдаем лучшим из отложенных
+        for x, y in deferred:
+            if len(found) >= free_slots:
+                break
+            accept(x, y)
+        return np.float32(found).reshape(-1, 2)
@@ -0,0 +1,129 @@
+import os
+import time
+import queue
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import profiling
+
+# --- Очередь рендеров ---
+# Задания (вход, выход, конфиг) рендерятся пулом потоков, одновременно - не больше
+# limit (его можно менять на ходу). Потоки рендера не трогают Tk: прогресс, статистика
+# и смена статуса уходят событиями в events, а GUI забирает их через poll() из
+# root.after с постоянной частотой. Прогресс шлется только при смене целого процента,
+# статистика профилировщика - не чаще stats_interval, так что на скорость рендера
+# это не влияет.
+
+def default_workers():
+    # у каждого рендера свои потоки ffmpeg и OpenCV - ядро на задание было бы слишком много
+    return max(1, (os.cpu_count() or 2) // 2)
+
+class RenderJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, input_path, output_path, config):
+        self.id = next(RenderJob._ids)
+        self.input_path = input_path
+        self.output_path = output_path
+        self.config = config
+        self.status = "queued"  # queued / running / done / failed / cancelled
+        self.error = None
+        self.cancel = threading.Event()
+        self.profiler = profiling.Profiler(config.get('PROFILE_WINDOW', 50), config.get('TRACE_FILE') or None)
+
+class RenderQueue:
+    def __init__(self, limit=None, stats_interval=0.5):
+        self.max_workers = os.cpu_count() or 1
+        self.limit = min(limit or default_workers(), self.max_workers)
+        self.stats_interval = stats_interval
+        self.events = queue.Queue()  # (job, "status" | "progress" | "stats", значение)
+        self.jobs = []
+        self.running = 0
+        self.slots = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+
+    def submit(self, input_path, output_path, config):
+        job = RenderJob(input_path, output_path, config)
+        self.jobs.append(job)
+        self.events.put((job, "status", "queued"))
+        self.pool.submit(self._run, job)
+        return job
+
+    def set_limit(self, limit):
+        with self.slots:
+            self.limit = max(1, min(int(limit), self.max_workers))
+            self.slots.notify_all()
+
+    def cancel(self, job):
+        job.cancel.set()
+        with self.slots:
+            # задание могло ждать свободного места - пусть проснется и выйдет
+            self.slots.notify_all()
+
+    def poll(self):
+        """Все накопившиеся события (вызывать из потока Tk)."""
+        events = []
+        try:
+            while True:
+                events.append(self.events.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+    def shutdown(self):
+        for job in self.jobs:
+            self.cancel(job)
+        self.pool.shutdown(wait=False)
+
+    def _run(self, job):
+        with self.slots:
+            while self.running >= self.limit and not job.cancel.is_set():
+                self.slots.wait()
+            if job.cancel.is_set():
+                self._finish(job, "cancelled")
+                return
+            self.running += 1
+        try:
+            self._render(job)
+        finally:
+            with self.slots:
+                self.running -= 1
+                self.slots.notify_all()
+
+    def _render(self, job):
+        import test as engine  # движок грузится лениво (см. gui.load_engine)
+        import ffmpeg_io
+
+        last_percent = [-1]
+        def progress(percent=None, **kwargs):
+            # proglog зовет этот же callback еще и с одними kwargs (t__index=...) - их пропускаем
+            if isinstance(percent, (int, float)) and int(percent) != last_percent[0]:
+                last_percent[0] = int(percent)
+                self.events.put((job, "progress", percent))
+
+        last_stats = [0.0]
+        def stats(record):
+            now = time.perf_counter()
+            if now - last_stats[0] >= self.stats_interval:
+                last_stats[0] = now
+                self.events.put((job, "stats", job.profiler.snapshot()))
+        job.profiler.add_hook(stats)
+
+        job.status = "running"
+        self.events.put((job, "status", "running"))
+        try:
+            engine.run_video_processing(job.config, job.input_path, job.output_path, progress_callback=progress,
+                                        profiler=job.profiler, cancel=job.cancel)
+            self.events.put((job, "stats", job.profiler.snapshot()))
+            self._finish(job, "done")
+        except ffmpeg_io.RenderCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, "failed")
+        finally:
+            job.profiler.close()
+
+    def _finish(self, job, status):
+        job.status = status
+        self.events.put((job, "status", status))
@@ -0,0 +1,142 @@
+import os
+import time
+import json
+import shutil
+import hashlib
+import numpy as np
+import ffmpeg_io
+import trackcache
+import test as engine
+
+# --- Рендер с продолжением ---
+# Видео пишется закрытыми сегментами по SEGMENT_SECONDS в папку <выход>.части,
+# на каждой границе сегмента на диск ложится снимок трекера (test.Checkpoint).
+# state.json хранит ключ рендера (исходник + конфиг), зерно и список готовых сегментов.
+# Без SEED зерно выбирается случайно и запоминается: случайность трекера и связей
+# при продолжении та же, что была бы без перерыва.
+# После сбоя или отмены тот же рендер продолжается с последнего готового сегмента;
+# результат совпадает с рендером без перерыва. В конце сегменты склеиваются без
+# перекодирования, папка удаляется.
+
+def render_key(input_path, config):
+    blob = json.dumps(config, sort_keys=True, default=str)
+    h = hashlib.sha1()
+    h.update(trackcache.source_hash(input_path).encode())
+    h.update(blob.encode())
+    return h.hexdigest()
+
+def work_dir(output_path):
+    return output_path + ".части"
+
+def load_state(path, key):
+    state_path = os.path.join(path, "state.json")
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf8") as f:
+            state = json.load(f)
+        if state.get("key") == key:
+            # state.json от старой версии без зерна
+            state.setdefault("seed", os.urandom(8).hex())
+            return state
+    # другой рендер или ничего нет - начинаем с нуля
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return {"key": key, "seed": os.urandom(8).hex(), "segments": []}
+
+def save_state(path, state):
+    tmp = os.path.join(path, "state.json.tmp")
+    with open(tmp, "w", encoding="utf8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(path, "state.json"))
+
+def run_resumable_processing(config, input_video_path, output_video_path, logger=None, cancel=None, profiler=None):
+    """
+    Рендер по сегментам с продолжением. cancel (threading.Event) останавливает
+    рендер после текущего кадра: готовые сегменты и снимки остаются на диске.
+    profiler (profiling.Profiler) получает по записи на кадр, как в stream режиме.
+    """
+    info = ffmpeg_io.probe_video(input_video_path)
+    path = work_dir(output_video_path)
+    track_path = engine.cached_track(config, input_video_path)
+    # сегменты по треку из кэша и по живому трекеру не смешиваем
+    state = load_state(path, render_key(input_video_path, dict(config, TRACK_REPLAY=track_path is not None)))
+    if config.get('SEED') is None:
+        config = dict(config, SEED=state["seed"])
+    encoder = ffmpeg_io.encoder_from_config(config)
+    segment_frames = max(int(round(config.get('SEGMENT_SECONDS', 10) * info['fps'])), 1)
+
+    if track_path is not None:
+        # трек из кэша: кадр рисуется по номеру, снимки трекера не нужны
+        tracker = engine.ReplayRenderer(trackcache.TrackReplay(track_path), config)
+    else:
+        tracker = engine.Tracker(config)
+    engine.attach_audio(config, input_video_path, tracker)
+    start = 0
+    if state["segments"]:
+        last = state["segments"][-1]
+        if last["checkpoint"] is not None:
+            engine.Checkpoint.load(os.path.join(path, last["checkpoint"])).restore(tracker)
+        start = last["end"]
+        print(f"продолжаю с кадра {start} (готово сегментов: {len(state['segments'])})")
+
+    if logger is not None:
+        logger(t__total=max(info['n_frames'], 1))
+        logger(t__index=start)
+    if profiler is not None:
+        profiler.attach(tracker)
+        profiler.begin(max(info['n_frames'] - start, 0))
+
+    reader = ffmpeg_io.open_reader(input_video_path, config.get('DECODER', 'ffmpeg'), info, start_frame=start)
+    frame = np.empty((reader.height, reader.width, 3), np.uint8)
+    index = start
+    finished = False
+    try:
+        while not finished:
+            number = len(state["segments"])
+            segment_path = os.path.join(path, f"segment_{number:04d}.mp4")
+            writer = ffmpeg_io.FFmpegWriter(segment_path, reader.width, reader.height, reader.fps, encoder=encoder)
+            segment_start = index
+            try:
+                while index - segment_start < segment_frames:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    began = time.perf_counter()
+                    if not reader.read(frame):
+                        finished = True
+                        break
+                    decoded = time.perf_counter()
+                    tracker.process(frame, index / reader.fps, in_place=True)
+                    drawn = time.perf_counter()
+                    writer.write(frame)
+                    if profiler is not None:
+                        profiler.frame(index, decoded - began, time.perf_counter() - drawn)
+                    index += 1
+                    if logger is not None:
+                        logger(t__index=index)
+            finally:
+                writer.close()
+
+            if cancel is not None and cancel.is_set():
+                # недописанный сегмент выбрасываем, готовые остаются для продолжения
+                os.remove(segment_path)
+                raise ffmpeg_io.RenderCancelled()
+            if index == segment_start:
+                os.remove(segment_path)
+                break
+
+            checkpoint = None
+            if track_path is None:
+                checkpoint = f"checkpoint_{number:04d}.npz"
+                engine.Checkpoint(tracker).save(os.path.join(path, checkpoint))
+            state["segments"].append({"path": os.path.basename(segment_path), "start": segment_start, "end": index,
+                                      "checkpoint": checkpoint})
+            save_state(path, state)
+    finally:
+        reader.close()
+
+    audio_source = input_video_path if info['has_audio'] else None
+    ffmpeg_io.concat_segments([os.path.join(path, s["path"]) for s in state["segments"]],
+                              output_video_path, audio_source, encoder)
+    shutil.rmtree(path, ignore_errors=True)
+    # склейки до перерыва приехали в трекер вместе со снимком (Checkpoint.cuts), у трека - из его meta
+    engine.export_cuts(config, tracker.cuts)
+    return index
@@ -0,0 +1,95 @@
+import json
+import subprocess
+import numpy as np
+import cv2
+import ffmpeg_io
+
+# --- Детектор склеек ---
+# Сравниваем крошечные (32x18) серые сигнатуры соседних кадров:
+# на жесткой склейке среднее абсолютное отличие резко прыгает.
+# Трекер (SCENE_CUT) дополнительно сверяет гистограммы яркости (hist_threshold):
+# быстрое движение меняет сигнатуру, но почти не трогает гистограмму,
+# поэтому склейкой считается только скачок обеих.
+
+SIGNATURE_SIZE = (32, 18)
+HIST_BINS = 32
+
+class SceneCutDetector:
+    def __init__(self, threshold=30.0, hist_threshold=None):
+        self.threshold = threshold
+        self.hist_threshold = hist_threshold
+        self.prev_signature = None
+        self.prev_hist = None
+
+    def signature(self, gray):
+        return cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def histogram(self, gray):
+        hist = cv2.calcHist([gray], [0], None, [HIST_BINS], [0, 256]).ravel()
+        return hist / max(hist.sum(), 1.0)
+
+    def update(self, signature, hist=None):
+        # True, если между прошлым и текущим кадром склейка
+        prev, prev_hist = self.prev_signature, self.prev_hist
+        self.prev_signature, self.prev_hist = signature, hist
+        if prev is None:
+            return False
+        if float(np.mean(np.abs(signature - prev))) <= self.threshold:
+            return False
+        if self.hist_threshold is None or hist is None or prev_hist is None:
+            return True
+        # доля яркости, "переехавшая" в другие корзины (0..1)
+        return float(np.abs(hist - prev_hist).sum()) / 2 > self.hist_threshold
+
+    def check(self, prev_gray, gray):
+        """Склейка между серыми кадрами; после сброса подпись прошлого кадра считается из prev_gray."""
+        with_hist = self.hist_threshold is not None
+        if self.prev_signature is None and prev_gray is not None:
+            self.update(self.signature(prev_gray), self.histogram(prev_gray) if with_hist else None)
+        return self.update(self.signature(gray), self.histogram(gray) if with_hist else None)
+
+    def reset(self):
+        self.prev_signature = None
+        self.prev_hist = None
+
+def find_scene_cuts(path, threshold=5.0, hist_threshold=None):
+    """
+    Номера кадров, с которых начинается новая сцена. ffmpeg сразу отдает маленькие серые кадры;
+    пороги те же, что у трекера (SCENE_CUT_THRESHOLD / SCENE_CUT_HIST).
+    """
+    w, h = SIGNATURE_SIZE
+    cmd = [ffmpeg_io.FFMPEG_BINARY, "-loglevel", "error", "-i", path,
+           "-vf", f"scale={w}:{h}:flags=area", "-f", "rawvideo", "-pix_fmt", "gray", "-"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    detector = SceneCutDetector(threshold, hist_threshold)
+    cuts = []
+    index = 0
+    buf = np.empty((h, w), np.uint8)
+    view = memoryview(buf).cast("B")
+    try:
+        while True:
+            got = 0
+            while got < w * h:
+                n = proc.stdout.readinto(view[got:])
+                if not n:
+                    break
+                got += n
+            if got < w * h:
+                break
+            hist = detector.histogram(buf) if hist_threshold is not None else None
+            if detector.update(buf.astype(np.float32), hist):
+                cuts.append(index)
+            index += 1
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    return cuts
+
+def write_cuts(path, cuts):
+    """Время склеек (секунды) в JSON - для других стадий."""
+    with open(path, "w", encoding="utf8") as f:
+        json.dump([round(t, 6) for t in cuts], f)
+
+def load_cuts(path):
+    with open(path, encoding="utf8") as f:
+        return json.load(f)
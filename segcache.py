@@ -0,0 +1,123 @@
+import os
+import json
+import hashlib
+import subprocess
+import ffmpeg_io
+import parallel
+import scenes
+import test as engine
+
+# --- Кэш готовых сегментов ---
+# Выход режется на куски по SEGMENT_SECONDS, каждый рендерится отдельно (свежий трекер
+# с прогревом на WARMUP_FRAMES кадрах, как в parallel.py) и кладется в
+# CACHE_DIR/сегменты под ключом от содержимого: md5 декодированных кадров куска и
+# прогрева (ffmpeg framemd5), конфиг, зерно, отрезки RANGES, которые задевают кусок,
+# и огибающая звука при AUDIO_REACTIVE. При повторном рендере готовые куски берутся
+# из кэша, перерендериваются только те, что изменились:
+#   - исходник дописан или обрезан в конце - новые/последний куски;
+#   - поменялся RANGES на отрезке - куски этого отрезка.
+# Обрезка исходника в начале сдвигает все границы - тогда перерендер целиком.
+# Без SEED берется зерно 0: кэш имеет смысл только при повторяемом рендере.
+# Рядом с куском лежит <ключ>.cuts.json - склейки куска для SCENE_CUT_FILE.
+# С TRACK_CACHE и готовым треком куски рисуются по треку, без своего трекера.
+
+# ключи, которые не меняют картинку
+IGNORED_KEYS = (
+    "TRACE_FILE", "PROFILE_WINDOW", "CACHE_DIR", "SEGMENT_CACHE", "RESUMABLE", "WORKERS",
+    "PIPELINE", "QUEUE_DEPTH", "SCENE_CUT_FILE", "RANGES", "DECODER", "BACKEND",
+    "CHECKPOINT_INTERVAL", "CHECKPOINT_LIMIT", "TRACK_CACHE", "LABEL_CACHE_SIZE",
+)
+
+def frame_hashes(path):
+    """md5 каждого декодированного кадра (тот же порядок кадров, что у FFmpegReader)."""
+    cmd = [ffmpeg_io.FFMPEG_BINARY, "-loglevel", "error", "-i", path, "-map", "0:v:0", "-vsync", "0",
+           "-f", "framemd5", "-"]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    return [line.rsplit(",", 1)[1].strip() for line in out.decode().splitlines()
+            if line and not line.startswith("#")]
+
+def config_key(config):
+    params = {k: v for k, v in config.items() if k not in IGNORED_KEYS}
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+def segment_key(base, hashes, start, end, warmup, fps, config, envelope=None):
+    h = hashlib.sha1(base.encode())
+    h.update(f"{start}:{end}:{warmup}:{fps}".encode())
+    first = max(0, start - warmup)
+    for frame_hash in hashes[first:end]:
+        h.update(frame_hash.encode())
+    ranges = [item for item in config.get('RANGES') or ()
+              if item['start'] < end / fps and item['end'] > start / fps]
+    h.update(json.dumps(ranges, sort_keys=True, default=str).encode())
+    if envelope is not None:
+        h.update(envelope.onset[first:end].tobytes())
+        h.update(envelope.energy[first:end].tobytes())
+    return h.hexdigest()
+
+def run_cached_processing(config, input_video_path, output_video_path, logger=None, cancel=None, profiler=None):
+    if config.get('SEED') is None:
+        config = dict(config, SEED=0)
+    info = ffmpeg_io.probe_video(input_video_path)
+    fps = info['fps']
+    print("считаю хэши кадров...")
+    hashes = frame_hashes(input_video_path)
+    n_frames = len(hashes)
+    length = max(int(round(config.get('SEGMENT_SECONDS', 10) * fps)), 1)
+    warmup = config.get('WARMUP_FRAMES', 10)
+    envelope = engine.attach_audio(config, input_video_path)
+    track_path = engine.cached_track(config, input_video_path)
+
+    cache_dir = os.path.join(config.get("CACHE_DIR", "кэш"), "сегменты")
+    os.makedirs(cache_dir, exist_ok=True)
+    base = config_key(config)
+    if track_path is not None:
+        # куски по треку из кэша отличаются от кусков со своим трекером и прогревом
+        base += ":" + os.path.basename(track_path)
+    segments = []
+    for start in range(0, n_frames, length):
+        end = min(start + length, n_frames)
+        key = segment_key(base, hashes, start, end, warmup, fps, config, envelope)
+        segments.append((start, end, os.path.join(cache_dir, key + ".mp4")))
+
+    def cuts_path(path):
+        return path[:-len(".mp4")] + ".cuts.json"
+
+    if logger is not None:
+        logger(t__total=max(n_frames, 1))
+    def is_cached(path):
+        return os.path.exists(path) and os.path.exists(cuts_path(path))
+
+    if profiler is not None:
+        # ETA считаем только по кускам, которые придется рендерить
+        profiler.begin(sum(end - start for start, end, path in segments if not is_cached(path)))
+    done = 0
+    cached = 0
+    cuts = []
+    for start, end, path in segments:
+        if is_cached(path):
+            cached += 1
+            done += end - start
+            cuts += scenes.load_cuts(cuts_path(path))
+        else:
+            tmp = path + ".tmp.mp4"
+            base_done = done
+
+            def progress(written):
+                if logger is not None:
+                    logger(t__index=base_done + written)
+
+            _, segment_cuts = parallel.render_segment(config, input_video_path, info, start, end, tmp, warmup,
+                                                      progress, cancel, profiler, track_path)
+            scenes.write_cuts(cuts_path(path), segment_cuts)
+            os.replace(tmp, path)
+            cuts += segment_cuts
+            done = end
+        if logger is not None:
+            logger(t__index=done)
+    print(f"сегментов из кэша: {cached} из {len(segments)}")
+
+    audio_source = input_video_path if info['has_audio'] else None
+    ffmpeg_io.concat_segments([path for _, _, path in segments], output_video_path, audio_source,
+                              ffmpeg_io.encoder_from_config(config))
+    engine.export_cuts(config, cuts)
+    return n_frames
@@ -0,0 +1,103 @@
+import numpy as np
+
+# --- Пространственный индекс ---
+# Равномерная сетка поверх массива точек, перестраивается каждый кадр.
+# Точки сортируются по номеру клетки, поиск соседей - searchsorted по соседним
+# клеткам, все без питоновских циклов по точкам.
+
+class GridIndex:
+    def __init__(self, points, cell):
+        self.points = np.asarray(points, np.float32).reshape(-1, 2)
+        self.cell = max(float(cell), 1.0)
+        cells = np.floor(self.points / self.cell).astype(np.int64)
+        self.keys = self._key(cells[:, 0], cells[:, 1])
+        self.order = np.argsort(self.keys, kind="stable")
+        self.sorted_keys = self.keys[self.order]
+        self.cells = cells
+
+    @staticmethod
+    def _key(cx, cy):
+        # клетки могут быть и отрицательными (точки за краем кадра)
+        return (cx + (1 << 20)) * (1 << 21) + (cy + (1 << 20))
+
+    def candidate_pairs(self, query, reach=1):
+        """Пары (i запроса, j точки индекса) из клеток в пределах reach клеток."""
+        query = np.asarray(query, np.float32).reshape(-1, 2)
+        qcells = np.floor(query / self.cell).astype(np.int64)
+        qi, pj = [], []
+        for dy in range(-reach, reach + 1):
+            for dx in range(-reach, reach + 1):
+                keys = self._key(qcells[:, 0] + dx, qcells[:, 1] + dy)
+                start = np.searchsorted(self.sorted_keys, keys, side="left")
+                end = np.searchsorted(self.sorted_keys, keys, side="right")
+                counts = end - start
+                if not counts.any():
+                    continue
+                rows = np.repeat(np.arange(len(query)), counts)
+                # позиции внутри отсортированного массива: start + 0..count-1
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                qi.append(rows)
+                pj.append(self.order[np.repeat(start, counts) + offsets])
+        if not qi:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        return np.concatenate(qi), np.concatenate(pj)
+
+    def pairs_within(self, radius):
+        """Все пары i < j на расстоянии не больше radius."""
+        reach = int(np.ceil(radius / self.cell))
+        i, j = self.candidate_pairs(self.points, reach)
+        keep = i < j
+        i, j = i[keep], j[keep]
+        d2 = np.sum((self.points[i] - self.points[j]) ** 2, axis=1)
+        keep = d2 <= radius * radius
+        return np.stack([i[keep], j[keep]], axis=1)
+
+    def knn_pairs(self, k):
+        """
+        Ребра к k ближайшим соседям (без повторов). Соседей ищем только в
+        окрестности 3x3 клетки, так что для редких одиноких точек это приближение.
+        """
+        n = len(self.points)
+        if n < 2:
+            return np.empty((0, 2), np.int64)
+        i, j = self.candidate_pairs(self.points, 1)
+        keep = i != j
+        i, j = i[keep], j[keep]
+        d2 = np.sum((self.points[i] - self.points[j]) ** 2, axis=1)
+        # для каждой точки берем k самых близких кандидатов
+        order = np.lexsort((d2, i))
+        i, j = i[order], j[order]
+        first = np.searchsorted(i, i, side="left")
+        rank = np.arange(len(i)) - first
+        keep = rank < k
+        edges = np.sort(np.stack([i[keep], j[keep]], axis=1), axis=1)
+        return np.unique(edges, axis=0)
+
+    def any_within(self, query, radius):
+        """Для каждой точки запроса: есть ли точка индекса ближе radius."""
+        query = np.asarray(query, np.float32).reshape(-1, 2)
+        result = np.zeros(len(query), bool)
+        if len(self.points) == 0 or len(query) == 0:
+            return result
+        reach = int(np.ceil(radius / self.cell))
+        qi, pj = self.candidate_pairs(query, reach)
+        d2 = np.sum((query[qi] - self.points[pj]) ** 2, axis=1)
+        result[qi[d2 < radius * radius]] = True
+        return result
+
+def knn_cell_size(points, k):
+    # клетка такого размера, чтобы в окрестности 3x3 было в среднем больше k точек
+    points = np.asarray(points, np.float32).reshape(-1, 2)
+    if len(points) < 2:
+        return 1.0
+    span = np.ptp(points, axis=0)
+    area = max(float(span[0]) * float(span[1]), 1.0)
+    return np.sqrt(area * (k + 1) / len(points))
+
+def link_pairs(points, mode, k=2, radius=150.0):
+    """Пары индексов для соединительных линий в режимах knn / radius."""
+    if len(points) < 2:
+        return np.empty((0, 2), np.int64)
+    if mode == "knn":
+        return GridIndex(points, knn_cell_size(points, k)).knn_pairs(k)
+    return GridIndex(points, radius).pairs_within(radius)
@@ -1,31 +1,22 @@
 import cv2
 import numpy as np
-import moviepy.editor as mpe
 import random
 import os
 import math
-from proglog import ProgressBarLogger  # Нужно для связи прогресс-бара
-
-# --- Defaults ---
-DEFAULT_CONFIG = {
-    "MAX_TRACKERS": 15,
-    "REDETECTION_INTERVAL": 30,
-    "WORDS": ["CAN", "YOU", "SEE", "ME", "?"],
-    "OBJ_LIFESPAN_MIN": 1.0,
-    "OBJ_LIFESPAN_MAX": 3.0,
-    "OBJ_SIZE_MIN": 30,
-    "OBJ_SIZE_MAX": 70,
-    "STAR_POINTS": 5,
-    "LINE_THICKNESS": 1,
-    "SHAPE": "star",
-    "THRESHOLD": 0.7 
-}
-
-# --- Глобальное состояние ---
-tracked_objects = []
-prev_gray = None
-frame_count = 0
-last_time = -1
+import copy
+import json
+from collections import OrderedDict
+import time
+from proglog import ProgressBarLogger, default_bar_logger  # Нужно для связи прогресс-бара
+import ffmpeg_io
+import pipeline
+import trackcache
+import profiling
+from overlay import draw_overlays
+from redetect import RedetectionScheduler
+import scenes
+import audio
+from defaults import DEFAULT_CONFIG  # раньше был здесь; остается доступен как test.DEFAULT_CONFIG
 
 # --- Класс для прогресс-бара ---
 class TkLogger(ProgressBarLogger):
@@ -41,19 +32,81 @@ class TkLogger(ProgressBarLogger):
                 percentage = (value / total) * 100
                 self.callback(percentage)
 
-class TrackedObject:
-    def __init__(self, point, creation_time, config):
-        self.id = random.randint(1000, 9999)
-        self.point = point
-        self.text = random.choice(config["WORDS"])
-        self.creation_time = creation_time
-        self.lifespan = random.uniform(config["OBJ_LIFESPAN_MIN"], config["OBJ_LIFESPAN_MAX"])
-        self.size = random.randint(config["OBJ_SIZE_MIN"], config["OBJ_SIZE_MAX"])
-        self.shimmer_phase = random.uniform(0, 2 * np.pi)
-
-    def is_alive(self, current_time):
+class ObjectStore:
+    """
+    Все объекты трекера в непрерывных numpy массивах (по массиву на поле).
+    Отсев мертвых, фильтр по status из LK и обновление точек - одна маска на кадр.
+    """
+
+    COLUMNS = {
+        "uid": np.int64,
+        "id": np.int32,
+        "creation_time": np.float64,
+        "lifespan": np.float64,
+        "shimmer_phase": np.float64,
+        # слово и размер чисто визуальные: храним сами случайные числа,
+        # чтобы при повторе трека из кэша их можно было пересчитать под новый конфиг
+        "word_u": np.float64,
+        "size_u": np.float64,
+        "size": np.int32,
+        "word_index": np.int32,
+    }
+
+    def __init__(self):
+        self.points = np.empty((0, 2), np.float32)
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.empty(0, dtype))
+
+    def __len__(self):
+        return len(self.points)
+
+    def keep(self, mask):
+        self.points = self.points[mask]
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[mask])
+
+    def extend(self, points, columns):
+        self.points = np.concatenate([self.points, np.asarray(points, np.float32).reshape(-1, 2)])
+        for name, dtype in self.COLUMNS.items():
+            if name in columns:
+                setattr(self, name, np.concatenate([getattr(self, name), np.asarray(columns[name], dtype)]))
+
+    def alive(self, current_time):
         return (current_time - self.creation_time) < self.lifespan
 
+    def spawn(self, points, creation_time, config, rng, first_uid):
+        # случайные параметры тянем по объекту в том же порядке, что и раньше
+        n = len(points)
+        columns = {name: np.empty(n, dtype) for name, dtype in self.COLUMNS.items()}
+        for i in range(n):
+            columns["id"][i] = rng.randint(1000, 9999)
+            columns["lifespan"][i] = rng.uniform(config["OBJ_LIFESPAN_MIN"], config["OBJ_LIFESPAN_MAX"])
+            columns["shimmer_phase"][i] = rng.uniform(0, 2 * np.pi)
+            columns["word_u"][i] = rng.random()
+            columns["size_u"][i] = rng.random()
+        columns["uid"] = np.arange(first_uid, first_uid + n)
+        columns["creation_time"][:] = creation_time
+        size, word_index = style_columns(columns["size_u"], columns["word_u"], config)
+        columns["size"] = size
+        columns["word_index"] = word_index
+        self.extend(points, columns)
+
+    def apply_style(self, config):
+        self.size, self.word_index = style_columns(self.size_u, self.word_u, config)
+
+    def styled(self, config):
+        # тот же набор объектов под другой визуальный конфиг: массивы трекинга общие
+        view = copy.copy(self)
+        view.apply_style(config)
+        return view
+
+def style_columns(size_u, word_u, config):
+    size_range = config["OBJ_SIZE_MAX"] - config["OBJ_SIZE_MIN"]
+    size = config["OBJ_SIZE_MIN"] + np.minimum((size_u * (size_range + 1)).astype(np.int32), size_range)
+    n_words = len(config["WORDS"])
+    word_index = np.minimum((word_u * n_words).astype(np.int32), n_words - 1)
+    return size.astype(np.int32), word_index
+
 def draw_star(img, center, size, thickness, star_points, current_time, creation_time, shimmer_phase):
     x, y = center
     outer_radius = size // 2
@@ -91,116 +144,707 @@ def draw_square(img, center, size, color, thickness):
     pt2 = (x + half_size, y + half_size)
     cv2.rectangle(img, pt1, pt2, color, thickness, lineType=cv2.LINE_AA)
 
-def process_frame_with_tracking(frame, t, config):
-    global prev_gray, tracked_objects, frame_count, last_time
-
-    if t < last_time:
-        prev_gray = None
-        tracked_objects = []
-        frame_count = 0
-    last_time = t
-
-    current_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    output_frame = frame.copy()
-
-    tracked_objects = [obj for obj in tracked_objects if obj.is_alive(t)]
-
-    if len(tracked_objects) > 0:
-        old_points = np.float32([obj.point for obj in tracked_objects]).reshape(-1, 1, 2)
-        new_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, current_gray, old_points, None, **config['lk_params'])
-        good_new_points = new_points[status == 1]
-        survived_objects = [obj for i, obj in enumerate(tracked_objects) if status[i] == 1]
-
-        for i, obj in enumerate(survived_objects):
-            obj.point = tuple(good_new_points[i].ravel())
-        tracked_objects = survived_objects
-
-    # Условие переобнаружения с учетом THRESHOLD (qualityLevel)
-    if len(tracked_objects) < config['MAX_TRACKERS'] // 2 or frame_count % config['REDETECTION_INTERVAL'] == 0:
-        mask = np.ones_like(current_gray)
-        for obj in tracked_objects:
-            x, y = map(int, obj.point)
-            cv2.circle(mask, (x, y), 15, 0, -1)
-            
-        # Используем параметр THRESHOLD как qualityLevel, но инвертируем или адаптируем если нужно
-        # Обычно qualityLevel это от 0.01 до 1.0. 
-        # В GUI у тебя THRESHOLD. Давай используем его напрямую в feature_params
-        
-        # Обновляем параметры, если они были переданы через config
-        local_feature_params = config['feature_params'].copy()
-        
-        new_features = cv2.goodFeaturesToTrack(current_gray, mask=mask, **local_feature_params)
-        
-        if new_features is not None:
-            for point in new_features:
-                if len(tracked_objects) < config['MAX_TRACKERS']:
-                    tracked_objects.append(TrackedObject(tuple(point.ravel()), t, config))
-
-    if tracked_objects:
-        for obj in tracked_objects:
-            x, y = map(int, obj.point)
-            
-            text_color = (255, 255, 255)
-            if config['SHAPE'] == 'star':
-                draw_star(output_frame, (x, y), obj.size, config['LINE_THICKNESS'], config['STAR_POINTS'], t, obj.creation_time, obj.shimmer_phase)
-                shimmer_val = (math.sin((t - obj.creation_time) * 4 + obj.shimmer_phase) + 1) / 2
-                text_gray = int(155 + shimmer_val * 100)
-                text_color = (text_gray, text_gray, text_gray)
-
-            elif config['SHAPE'] == 'square':
-                square_color = (200, 200, 200)
-                draw_square(output_frame, (x,y), obj.size, square_color, config['LINE_THICKNESS'])
-                text_color = square_color
-
-            text_x = x - obj.size // 2
-            text_y = y - obj.size // 2 - 5
-            cv2.putText(output_frame, obj.text, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1, lineType=cv2.LINE_AA)
-
-        if len(tracked_objects) > 1:
-            line_color = (100, 100, 100)
-            num_lines = len(tracked_objects) // 2
-            temp_list = random.sample(tracked_objects, len(tracked_objects))
-            for i in range(num_lines):
-                obj1 = temp_list[i*2]
-                obj2 = temp_list[i*2 + 1]
-                pt1 = tuple(map(int, obj1.point))
-                pt2 = tuple(map(int, obj2.point))
-                cv2.line(output_frame, pt1, pt2, line_color, config['LINE_THICKNESS'], lineType=cv2.LINE_AA)
-
-    prev_gray = current_gray.copy()
-    frame_count += 1
-    
-    return output_frame
+def tracking_params(config):
+    """Заполняет feature_params / lk_params (если их нет) так же, как GUI."""
+    if 'feature_params' not in config:
+        config['feature_params'] = dict(
+            maxCorners=config['MAX_TRACKERS'],
+            qualityLevel=1.0 - config['THRESHOLD'] + 0.01,
+            minDistance=8,
+            blockSize=7
+        )
+    if 'lk_params' not in config:
+        config['lk_params'] = dict(winSize=(15, 15), maxLevel=2, criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+    else:
+        # из JSON приходят списки, а OpenCV ждет кортежи
+        lk = config['lk_params'] = dict(config['lk_params'])
+        for key in ('winSize', 'criteria'):
+            if key in lk:
+                lk[key] = tuple(lk[key])
+    return config
+
+def config_at(config, t):
+    """
+    Конфиг для кадра t: RANGES - список {"start": сек, "end": сек, "config": {...}},
+    визуальные настройки, которые действуют только на этом отрезке.
+    """
+    for item in config.get('RANGES') or ():
+        if item['start'] <= t < item['end']:
+            config = dict(config, **item['config'])
+    return config
+
+# размеры в пикселях, которые пересчитываются под уменьшенный кадр (превью, прокси)
+SCALED_KEYS = ("OBJ_SIZE_MIN", "OBJ_SIZE_MAX", "SPAWN_MIN_DIST", "LINK_RADIUS")
+
+def scale_config(config, factor):
+    """Конфиг с размерами рисования под кадр, уменьшенный в factor раз."""
+    config = dict(config)
+    for key in SCALED_KEYS:
+        if key in config:
+            config[key] = type(config[key])(max(config[key] * factor, 1) if config[key] else 0)
+    config['LINE_THICKNESS'] = max(1, int(round(config['LINE_THICKNESS'] * factor)))
+    return config
+
+def is_partial(config):
+    """Рендер фрагмента или прокси (IN_POINT / OUT_POINT / PROXY_WIDTH / FPS_DIVISOR)."""
+    return bool(config.get('IN_POINT') or config.get('OUT_POINT') is not None
+                or config.get('PROXY_WIDTH') or config.get('FPS_DIVISOR', 1) > 1)
+
+def check_ranges(config):
+    for item in config.get('RANGES') or ():
+        changed = [k for k in trackcache.TRACKING_KEYS if k in item['config']]
+        if changed:
+            raise ValueError(f"RANGES меняет параметры трекинга: {', '.join(changed)}")
+
+def tracking_scale(width, height, config):
+    # TRACK_SCALE - прямой множитель, TRACK_MAX_EDGE - ограничение длинной стороны (0 = нет)
+    scale = min(float(config.get('TRACK_SCALE', 1.0)), 1.0)
+    max_edge = config.get('TRACK_MAX_EDGE', 0)
+    if max_edge:
+        scale = min(scale, max_edge / max(width, height))
+    return scale
+
+STAGES = ("gray", "lk", "redetect", "draw")
+
+class Checkpoint:
+    """Снимок состояния трекера после кадра frame_count (время last_time)."""
+
+    def __init__(self, tracker):
+        objects = tracker.objects
+        self.points = objects.points.copy()
+        self.columns = {name: getattr(objects, name).copy() for name in ObjectStore.COLUMNS}
+        self.prev_gray = None if tracker.prev_gray is None else tracker.prev_gray.copy()
+        self.rng_state = tracker.rng.getstate()
+        self.redetector_state = tracker.redetector.state()
+        self.frame_count = tracker.frame_count
+        self.last_time = tracker.last_time
+        self.next_uid = tracker.next_uid
+        self.cuts = list(tracker.cuts)
+
+    def restore(self, tracker):
+        objects = ObjectStore()
+        objects.points = self.points.copy()
+        for name, values in self.columns.items():
+            setattr(objects, name, values.copy())
+        tracker.objects = objects
+        tracker.rng.setstate(self.rng_state)
+        tracker.redetector.restore(self.redetector_state)
+        tracker.frame_count = self.frame_count
+        tracker.last_time = self.last_time
+        tracker.next_uid = self.next_uid
+        # предыдущий серый кадр кладем в тот буфер, который _gray сейчас не перезапишет
+        tracker.prev_gray = None if self.prev_gray is None else self.prev_gray.copy()
+        tracker.gray_buffers[(self.frame_count - 1) % 2] = tracker.prev_gray
+        tracker.scene_cuts.reset()
+        tracker.cuts = list(self.cuts)
+
+    def save(self, path):
+        # один .npz: массивы как есть, остальное - JSON строкой; пишем через временный файл
+        meta = {
+            "rng_state": self.rng_state,
+            "redetector_state": self.redetector_state,
+            "frame_count": self.frame_count,
+            "last_time": self.last_time,
+            "next_uid": self.next_uid,
+            "cuts": self.cuts,
+        }
+        arrays = {f"column_{name}": values for name, values in self.columns.items()}
+        if self.prev_gray is not None:
+            arrays["prev_gray"] = self.prev_gray
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, meta=np.array(json.dumps(meta)), points=self.points, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        checkpoint = cls.__new__(cls)
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            checkpoint.points = data["points"]
+            checkpoint.columns = {name: data[f"column_{name}"] for name in ObjectStore.COLUMNS}
+            checkpoint.prev_gray = data["prev_gray"] if "prev_gray" in data else None
+        version, internal, gauss = meta["rng_state"]
+        checkpoint.rng_state = (version, tuple(internal), gauss)
+        checkpoint.redetector_state = tuple(meta["redetector_state"])
+        checkpoint.frame_count = meta["frame_count"]
+        checkpoint.last_time = meta["last_time"]
+        checkpoint.next_uid = meta["next_uid"]
+        checkpoint.cuts = meta.get("cuts", [])
+        return checkpoint
+
+class Tracker:
+    """Состояние трекинга одного рендера (раньше было в глобальных переменных)."""
+
+    def __init__(self, config, seed=None):
+        check_ranges(config)
+        self.config = config
+        self.seed = config.get('SEED') if seed is None else seed
+        self.redetector = RedetectionScheduler(config)
+        # детектор склеек (SCENE_CUT): на склейке LK не запускается, трекеры ищутся заново
+        self.scene_cut = config.get('SCENE_CUT', False)
+        self.scene_cuts = scenes.SceneCutDetector(config.get('SCENE_CUT_THRESHOLD', 5.0),
+                                                  config.get('SCENE_CUT_HIST', 0.12))
+        # суммарное время по стадиям (сек), для bench.py и отчетов
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        # источник кадров для перемотки: get_frame(t) -> BGR кадр (см. set_frame_source)
+        self.frame_source = None
+        self.fps = None
+        # огибающая звука (audio.AudioEnvelope) для AUDIO_REACTIVE, см. attach_audio
+        self.audio = None
+        self.reset()
+
+    def reset(self):
+        self.objects = ObjectStore()
+        self.prev_gray = None
+        # два серых буфера по очереди: текущий кадр становится предыдущим без копирования
+        self.gray_buffers = [None, None]
+        self.small_frame = None
+        self.scale = 1.0
+        self.frame_count = 0
+        self.last_time = -1
+        self.next_uid = 0
+        self.rng = random.Random(self.seed)
+        self.redetector.reset()
+        self.scene_cuts.reset()
+        # время кадров, на которых была склейка (SCENE_CUT)
+        self.cuts = []
+        # снимки состояния по frame_count; нулевой - состояние до первого кадра.
+        # Без источника кадров (stream, конвейер, процессы) перемотки нет и снимки не нужны
+        self.checkpoint_interval = self.config.get('CHECKPOINT_INTERVAL', 30) if self.frame_source is not None else 0
+        self.checkpoints = OrderedDict()
+        if self.checkpoint_interval:
+            self.checkpoints[0] = Checkpoint(self)
+
+    def set_frame_source(self, get_frame, fps):
+        """С источником кадров перемотка назад восстанавливает снимок и догоняет до нужного кадра."""
+        self.frame_source = get_frame
+        self.fps = fps
+        # заново, уже со снимками
+        self.reset()
+
+    def _save_checkpoint(self):
+        self.checkpoints[self.frame_count] = Checkpoint(self)
+        if len(self.checkpoints) > self.config.get('CHECKPOINT_LIMIT', 32):
+            # прореживаем: шаг вдвое больше, снимки равномерно покрывают все видео
+            self.checkpoint_interval *= 2
+            for key in [k for k in self.checkpoints if k % self.checkpoint_interval]:
+                del self.checkpoints[key]
+
+    def _skips_frames(self, t):
+        # прыжок вперед через несколько кадров (догнать можно только с источником кадров)
+        if self.frame_source is None:
+            return False
+        last = int(round(self.last_time * self.fps)) if self.last_time >= 0 else -1
+        return int(round(t * self.fps)) > last + 1
+
+    def _seek(self, t):
+        # последний снимок строго раньше t; вперед от текущего кадра снимок нужен, только если он ближе к t
+        checkpoint = None
+        for cp in self.checkpoints.values():
+            if cp.last_time < t and (checkpoint is None or cp.last_time > checkpoint.last_time):
+                checkpoint = cp
+        if t < self.last_time or checkpoint.last_time > self.last_time:
+            checkpoint.restore(self)
+        if self.frame_source is None:
+            return
+        # догоняем: прогоняем пропущенные кадры между снимком и t
+        start = 0 if self.last_time < 0 else int(round(self.last_time * self.fps)) + 1
+        for index in range(start, int(round(t * self.fps))):
+            self.update(self.frame_source(index / self.fps), index / self.fps)
+
+    def _gray(self, frame):
+        h, w = frame.shape[:2]
+        self.scale = tracking_scale(w, h, self.config)
+        size = (max(int(round(w * self.scale)), 1), max(int(round(h * self.scale)), 1))
+        slot = self.frame_count % 2
+        buf = self.gray_buffers[slot]
+        if buf is None or buf.shape != (size[1], size[0]):
+            buf = self.gray_buffers[slot] = np.empty((size[1], size[0]), np.uint8)
+        if self.scale < 1.0:
+            # сначала уменьшаем, потом переводим в серый: обе операции на маленьком кадре
+            self.small_frame = cv2.resize(frame, size, dst=self.small_frame, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self.small_frame, cv2.COLOR_BGR2GRAY, dst=buf)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=buf)
+        return buf
+
+    def update(self, frame, t):
+        # Трекинг без рисования: оптический поток + переобнаружение
+        config = self.config
+        objects = self.objects
+
+        if t == self.last_time:
+            # тот же кадр еще раз: объекты уже посчитаны для него
+            return
+        if t < self.last_time and not self.checkpoints:
+            self.reset()
+        elif self.checkpoints and (t < self.last_time or self._skips_frames(t)):
+            self._seek(t)
+        objects = self.objects
+        self.last_time = t
+
+        timings = self.timings
+        start = time.perf_counter()
+        current_gray = self._gray(frame)
+        lap = time.perf_counter()
+        timings["gray"] += lap - start
+
+        objects.keep(objects.alive(t))
+
+        # точки объектов хранятся в координатах исходного кадра, трекинг идет в масштабе self.scale
+        scale = np.float32(self.scale)
+
+        if self.scene_cut and self.scene_cuts.check(self.prev_gray, current_gray):
+            # склейка: старые точки в новом плане - мусор, LK не запускаем, ищем заново по всему кадру
+            self.cuts.append(t)
+            objects.keep(np.zeros(len(objects), bool))
+            self.redetector.force()
+        elif len(objects) > 0:
+            old_points = (objects.points * scale).reshape(-1, 1, 2)
+            new_points, status, errors = cv2.calcOpticalFlowPyrLK(self.prev_gray, current_gray, old_points, None, **config['lk_params'])
+            good = status.ravel() == 1
+
+            if config.get('FB_CHECK'):
+                # прямой-обратный проход: точка должна вернуться туда, откуда ушла
+                back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(current_gray, self.prev_gray, new_points, None, **config['lk_params'])
+                fb_error = np.linalg.norm((back_points - old_points).reshape(-1, 2), axis=1) / scale
+                good &= (back_status.ravel() == 1) & (fb_error < config.get('FB_THRESHOLD', 1.0))
+
+            self.redetector.observe_flow(len(objects), int(good.sum()), errors.ravel()[good])
+            objects.points = new_points.reshape(-1, 2) / scale
+            objects.keep(good)
+        start = time.perf_counter()
+        timings["lk"] += start - lap
+
+        # на ударе в звуке - внеочередной поиск и временно больше объектов
+        burst = 0
+        if self.audio is not None:
+            onset = self.audio.onset_at(t)
+            if onset >= config.get('AUDIO_ONSET_THRESHOLD', 0.6):
+                self.redetector.force()
+                burst = int(config['MAX_TRACKERS'] * config.get('AUDIO_BURST', 0.5) * onset)
+
+        # Переобнаружение: когда и где искать решает RedetectionScheduler
+        if self.redetector.should_detect(len(objects), self.frame_count):
+            radius = max(int(round(15 * self.scale)), 1)
+
+            # THRESHOLD уже пересчитан в qualityLevel внутри feature_params
+            feature_params = config['feature_params']
+            if self.scale < 1.0:
+                feature_params = dict(feature_params, minDistance=feature_params.get('minDistance', 1) * self.scale)
+            if burst:
+                feature_params = dict(feature_params, maxCorners=config['MAX_TRACKERS'] + burst)
+
+            free_slots = max(config['MAX_TRACKERS'] + burst - len(objects), 0)
+            min_dist = config.get('SPAWN_MIN_DIST', 0) * self.scale
+            new_points = self.redetector.detect(current_gray, objects.points * scale, feature_params, radius, free_slots, min_dist)
+            if len(new_points):
+                new_points = new_points / scale
+                objects.spawn(new_points, t, config, self.rng, self.next_uid)
+                self.next_uid += len(new_points)
+        timings["redetect"] += time.perf_counter() - start
+
+        self.prev_gray = current_gray
+        self.frame_count += 1
+        if self.checkpoint_interval and self.frame_count % self.checkpoint_interval == 0:
+            self._save_checkpoint()
+
+    def process(self, frame, t, in_place=False):
+        self.update(frame, t)
+        # in_place: рисуем прямо в кадре (stream режим), иначе в копии
+        output_frame = frame if in_place else frame.copy()
+        start = time.perf_counter()
+        config = config_at(self.config, t)
+        objects = self.objects if config is self.config else self.objects.styled(config)
+        draw_overlays(output_frame, objects, t, config, self.audio and self.audio.levels(t))
+        self.timings["draw"] += time.perf_counter() - start
+        return output_frame
 
-def run_video_processing(config, input_video_path, output_video_path, progress_callback=None):
+class ReplayRenderer:
+    """Рисует объекты из сохраненного трека: только декодирование, рисование и кодирование."""
+
+    def __init__(self, replay, config, scale=1.0):
+        self.replay = replay
+        self.config = config
+        # прокси: трек записан в координатах полного кадра
+        self.scale = scale
+        self.fps = replay.meta["fps"]
+        self.objects = ObjectStore()
+        self.timings = {"draw": 0.0}
+        # склейки, найденные при записи трека
+        self.cuts = replay.meta.get("cuts", [])
+        self.audio = None
+
+    def objects_at(self, index):
+        rows = self.replay.points_at(index)
+        records = self.replay.object_records(rows["uid"])
+        points = np.stack([rows["x"], rows["y"]], axis=1)
+        if self.scale != 1.0:
+            points = points * self.scale
+        objects = ObjectStore()
+        objects.extend(points,
+                       {name: records[name] for name in records.dtype.names})
+        objects.apply_style(self.config)
+        return objects
+
+    def process(self, frame, t, in_place=False):
+        self.objects = self.objects_at(int(round(t * self.fps)))
+        output_frame = frame if in_place else frame.copy()
+        start = time.perf_counter()
+        config = config_at(self.config, t)
+        objects = self.objects if config is self.config else self.objects.styled(config)
+        draw_overlays(output_frame, objects, t, config, self.audio and self.audio.levels(t))
+        self.timings["draw"] += time.perf_counter() - start
+        return output_frame
+
+def attach_audio(config, input_video_path, *sources):
+    """AUDIO_REACTIVE: огибающая звука (из кэша или анализом) для трекеров и рендереров."""
+    if not config.get('AUDIO_REACTIVE'):
+        return None
+    envelope = audio.load_envelope(input_video_path, config)
+    for source in sources:
+        if source is not None:
+            source.audio = envelope
+    return envelope
+
+def cached_track(config, input_video_path):
+    """
+    TRACK_CACHE для рендера фрагмента и рендеров по частям: путь к сохраненному треку или None.
+    Сами эти режимы трек не записывают - его пишет обычный рендер или batch.py --track-only.
+    """
+    if not config.get('TRACK_CACHE'):
+        return None
+    track_path = trackcache.cache_path(config, trackcache.tracking_key(input_video_path, config))
+    if trackcache.has_track(track_path):
+        print("трек найден в кэше, трекинг пропускаю")
+        return track_path
+    print("трека в кэше нет, в этом режиме он не записывается (нужен обычный рендер или batch.py --track-only)")
+    return None
+
+def export_cuts(config, cuts):
+    """Пишет время склеек (секунды результата) в SCENE_CUT_FILE, если он задан."""
+    if config.get('SCENE_CUT_FILE'):
+        scenes.write_cuts(config['SCENE_CUT_FILE'], cuts)
+        print(f"склеек: {len(cuts)}, список в {config['SCENE_CUT_FILE']}")
+
+# Трекер по умолчанию для старого API process_frame_with_tracking(frame, t, config)
+tracker = None
+
+def process_frame_with_tracking(frame, t, config, in_place=False):
+    global tracker
+    if tracker is None or tracker.config is not config:
+        tracker = Tracker(config)
+    return tracker.process(frame, t, in_place=in_place)
+
+def run_video_processing(config, input_video_path, output_video_path, progress_callback=None, profiler=None,
+                         cancel=None):
     print("--------------------------\n")
     print("загрузка видео...")
-    try:
-        clip = mpe.VideoFileClip(input_video_path)
-    except Exception as e:
-        print(f"Ошибка при загрузке видео: {e}")
-        raise e
-
     print(f"рисую {config['SHAPE']}s!")
-    
-    global prev_gray, tracked_objects, frame_count, last_time
-    prev_gray = None
-    tracked_objects = []
-    frame_count = 0
-    last_time = -1
 
     # Подготовка логгера
     logger = 'bar'
     if progress_callback:
         logger = TkLogger(progress_callback)
 
-    processing_function = lambda gf, t: process_frame_with_tracking(gf(t)[:,:,::-1], t, config)[:,:,::-1]
-    final_clip = clip.fl(processing_function)
-
     print(f"результат будет сохранен в {output_video_path}...")
-    final_clip.write_videofile(output_video_path, codec='libx264', audio_codec='aac', logger=logger)
+    backend = config.get('BACKEND', 'stream')
+    if backend == 'stream' and not ffmpeg_io.ffmpeg_available():
+        # нет бинарника ffmpeg - откатываемся на moviepy; остальные ошибки stream режима не глотаем
+        print(f"ffmpeg не найден ({ffmpeg_io.FFMPEG_BINARY}), использую moviepy")
+        backend = 'moviepy'
+    if backend == 'stream':
+        if logger == 'bar':
+            logger = default_bar_logger('bar')
+        if is_partial(config):
+            # быстрый просмотр куска: без частей, кэша сегментов и процессов
+            run_range_processing(config, input_video_path, output_video_path, logger, profiler, cancel)
+        elif config.get('RESUMABLE'):
+            import resume
+            resume.run_resumable_processing(config, input_video_path, output_video_path, logger, cancel, profiler)
+        elif config.get('SEGMENT_CACHE'):
+            import segcache
+            segcache.run_cached_processing(config, input_video_path, output_video_path, logger, cancel, profiler)
+        elif config.get('WORKERS', 1) != 1:
+            import parallel
+            parallel.run_parallel_processing(config, input_video_path, output_video_path, logger, cancel)
+        else:
+            run_stream_processing(config, input_video_path, output_video_path, logger, profiler, cancel)
+        print("Готово!")
+        return
+
+    run_moviepy_processing(config, input_video_path, output_video_path, logger)
     print("Готово!")
 
+def run_stream_processing(config, input_video_path, output_video_path, logger='bar', profiler=None, cancel=None):
+    # Кадры идут из ffmpeg сразу в BGR, рисуем в том же буфере и отдаем в энкодер
+    if logger == 'bar':
+        logger = default_bar_logger('bar')
+    own_profiler = profiler is None and bool(config.get('TRACE_FILE'))
+    if own_profiler:
+        profiler = profiling.Profiler(config.get('PROFILE_WINDOW', 50), config['TRACE_FILE'])
+
+    tracker = Tracker(config)
+    source = tracker
+    recorder = None
+    if config.get('TRACK_CACHE'):
+        track_path = trackcache.cache_path(config, trackcache.tracking_key(input_video_path, config))
+        if trackcache.has_track(track_path):
+            print("трек найден в кэше, трекинг пропускаю")
+            renderer = source = ReplayRenderer(trackcache.TrackReplay(track_path), config)
+            processing_function = lambda frame, t: renderer.process(frame, t, in_place=True)
+        else:
+            recorder = trackcache.TrackRecorder()
+            def processing_function(frame, t):
+                tracker.process(frame, t, in_place=True)
+                recorder.record(tracker.objects)
+    else:
+        processing_function = lambda frame, t: tracker.process(frame, t, in_place=True)
+
+    attach_audio(config, input_video_path, source)
+    if profiler is not None:
+        profiler.attach(source)
+
+    stats = None
+    try:
+        if config.get('PIPELINE'):
+            frames, stats = pipeline.stream_video_pipelined(input_video_path, output_video_path, processing_function,
+                                                            logger=logger, decoder=config.get('DECODER', 'ffmpeg'),
+                                                            queue_depth=config.get('QUEUE_DEPTH', 4), profiler=profiler,
+                                                            cancel=cancel, encoder=ffmpeg_io.encoder_from_config(config))
+            stats.report()
+        else:
+            frames = ffmpeg_io.stream_video(input_video_path, output_video_path, processing_function, logger=logger,
+                                            decoder=config.get('DECODER', 'ffmpeg'), profiler=profiler, cancel=cancel,
+                                            encoder=ffmpeg_io.encoder_from_config(config))
+    finally:
+        if own_profiler:
+            profiler.report()
+            profiler.close()
+
+    if recorder is not None:
+        recorder.save(track_path, {"source": input_video_path, "fps": ffmpeg_io.probe_video(input_video_path)["fps"],
+                                   "cuts": tracker.cuts})
+    export_cuts(config, source.cuts)
+    return frames, stats
+
+def run_range_processing(config, input_video_path, output_video_path, logger='bar', profiler=None, cancel=None):
+    """
+    Рендер фрагмента [IN_POINT, OUT_POINT) сек и/или прокси: ширина PROXY_WIDTH, каждый
+    FPS_DIVISOR-й кадр. ffmpeg сразу прыгает к IN_POINT - WARMUP_FRAMES кадров, на них
+    трекер только прогревается; размеры рисования пересчитываются под прокси.
+    """
+    if logger == 'bar':
+        logger = default_bar_logger('bar')
+    info = ffmpeg_io.probe_video(input_video_path)
+    fps = info['fps']
+    step = max(int(config.get('FPS_DIVISOR', 1)), 1)
+    start = int(round(config.get('IN_POINT', 0) * fps))
+    end = info['n_frames'] if config.get('OUT_POINT') is None else int(round(config['OUT_POINT'] * fps))
+    warm_start = max(0, start - config.get('WARMUP_FRAMES', 10) * step)
+    warm_start = start - (start - warm_start) // step * step
+    # ключ трека - от исходного конфига, scale_config меняет SPAWN_MIN_DIST
+    track_path = cached_track(config, input_video_path)
+    if track_path is not None:
+        # объекты уже известны, прогрев не нужен
+        warm_start = start
+
+    size = None
+    factor = 1.0
+    if config.get('PROXY_WIDTH') and config['PROXY_WIDTH'] < info['width']:
+        factor = config['PROXY_WIDTH'] / info['width']
+        # четные размеры - так хочет yuv420p
+        size = (max(int(info['width'] * factor) // 2 * 2, 2), max(int(info['height'] * factor) // 2 * 2, 2))
+        config = scale_config(config, factor)
+
+    own_profiler = profiler is None and bool(config.get('TRACE_FILE'))
+    if own_profiler:
+        profiler = profiling.Profiler(config.get('PROFILE_WINDOW', 50), config['TRACE_FILE'])
+    if track_path is not None:
+        tracker = ReplayRenderer(trackcache.TrackReplay(track_path), config, factor)
+    else:
+        tracker = Tracker(config)
+    attach_audio(config, input_video_path, tracker)
+    if profiler is not None:
+        profiler.attach(tracker)
+
+    reader = ffmpeg_io.FFmpegReader(input_video_path, info, start_frame=warm_start, size=size, step=step)
+    audio_source = input_video_path if info['has_audio'] else None
+    writer = None
+    written = 0
+    try:
+        writer = ffmpeg_io.FFmpegWriter(output_video_path, reader.width, reader.height, fps / step, audio_source,
+                                        ffmpeg_io.encoder_from_config(config), audio_start=start / fps)
+        frame = np.empty((reader.height, reader.width, 3), np.uint8)
+        total = max((end - start + step - 1) // step, 1)
+        if logger is not None:
+            logger(t__total=total)
+        if profiler is not None:
+            profiler.begin(total)
+        index = warm_start
+        while index < end:
+            if cancel is not None and cancel.is_set():
+                break
+            began = time.perf_counter()
+            if not reader.read(frame):
+                break
+            decoded = time.perf_counter()
+            t = index / fps
+            if index < start:
+                tracker.update(frame, t)
+            else:
+                tracker.process(frame, t, in_place=True)
+                drawn = time.perf_counter()
+                writer.write(frame)
+                if profiler is not None:
+                    profiler.frame(written, decoded - began, time.perf_counter() - drawn)
+                written += 1
+                if logger is not None:
+                    logger(t__index=written)
+            index += step
+    finally:
+        reader.close()
+        if writer is not None:
+            writer.close()
+        if own_profiler:
+            profiler.report()
+            profiler.close()
+    if cancel is not None and cancel.is_set():
+        os.remove(output_video_path)
+        raise ffmpeg_io.RenderCancelled()
+    # склейки внутри фрагмента, время - от начала результата (склейки прогрева не в счет)
+    export_cuts(config, [t - start / fps for t in tracker.cuts if start / fps <= t < end / fps])
+    return written
+
+def run_variants_processing(config, input_video_path, variants, logger='bar'):
+    """
+    Несколько вариантов одного клипа за одно декодирование и один трекинг.
+    variants - список (overrides, output_path); overrides накладываются на config
+    и могут менять только визуальные параметры (SHAPE, WORDS, размеры...).
+    Каждый вариант рисуется в свою копию кадра и кодируется своим ffmpeg.
+    """
+    variant_configs = []
+    for overrides, path in variants:
+        changed = [k for k in trackcache.TRACKING_KEYS if k in overrides and overrides[k] != config.get(k)]
+        if changed:
+            raise ValueError(f"вариант {path} меняет параметры трекинга: {', '.join(changed)}")
+        variant_configs.append(dict(config, **overrides))
+    if logger == 'bar':
+        logger = default_bar_logger('bar')
+
+    tracker = Tracker(config)
+    renderer = recorder = None
+    if config.get('TRACK_CACHE'):
+        track_path = trackcache.cache_path(config, trackcache.tracking_key(input_video_path, config))
+        if trackcache.has_track(track_path):
+            print("трек найден в кэше, трекинг пропускаю")
+            renderer = ReplayRenderer(trackcache.TrackReplay(track_path), config)
+        else:
+            recorder = trackcache.TrackRecorder()
+    envelope = attach_audio(config, input_video_path, tracker)
+
+    reader = ffmpeg_io.open_reader(input_video_path, config.get('DECODER', 'ffmpeg'))
+    audio_source = input_video_path if reader.info.get("has_audio") else None
+    writers = []
+    try:
+        for (_, path), variant_config in zip(variants, variant_configs):
+            writers.append(ffmpeg_io.FFmpegWriter(path, reader.width, reader.height, reader.fps, audio_source,
+                                                  ffmpeg_io.encoder_from_config(variant_config)))
+        frame = np.empty((reader.height, reader.width, 3), np.uint8)
+        # последний вариант рисуем прямо в декодированном кадре, остальным - свои буферы
+        buffers = [np.empty_like(frame) for _ in variants[:-1]] + [frame]
+        if logger is not None:
+            logger(t__total=max(reader.info.get("n_frames", 0), 1))
+
+        index = 0
+        while reader.read(frame):
+            t = index / reader.fps
+            if renderer is not None:
+                objects = renderer.objects_at(index)
+            else:
+                tracker.update(frame, t)
+                objects = tracker.objects
+                if recorder is not None:
+                    recorder.record(objects)
+            for variant_config, buf, writer in zip(variant_configs, buffers, writers):
+                if buf is not frame:
+                    np.copyto(buf, frame)
+                frame_config = config_at(variant_config, t)
+                draw_overlays(buf, objects.styled(frame_config), t, frame_config, envelope and envelope.levels(t))
+                writer.write(buf)
+            index += 1
+            if logger is not None:
+                logger(t__index=index)
+    finally:
+        reader.close()
+        for writer in writers:
+            writer.close()
+
+    if recorder is not None:
+        recorder.save(track_path, {"source": input_video_path, "fps": reader.fps, "cuts": tracker.cuts})
+    export_cuts(config, (renderer or tracker).cuts)
+    return index
+
+def run_tracking_pass(config, input_video_path, logger=None):
+    """
+    Только трекинг (без рисования и кодирования): заполняет кэш трека.
+    Возвращает (путь к треку, сколько кадров прослежено; 0 - трек уже был в кэше).
+    """
+    track_path = trackcache.cache_path(config, trackcache.tracking_key(input_video_path, config))
+    if trackcache.has_track(track_path):
+        return track_path, 0
+
+    tracker = Tracker(config)
+    attach_audio(config, input_video_path, tracker)
+    recorder = trackcache.TrackRecorder()
+    reader = ffmpeg_io.open_reader(input_video_path, config.get('DECODER', 'ffmpeg'))
+    try:
+        frame = np.empty((reader.height, reader.width, 3), np.uint8)
+        if logger is not None:
+            logger(t__total=max(reader.info.get("n_frames", 0), 1))
+        index = 0
+        while reader.read(frame):
+            tracker.update(frame, index / reader.fps)
+            recorder.record(tracker.objects)
+            index += 1
+            if logger is not None:
+                logger(t__index=index)
+    finally:
+        reader.close()
+    recorder.save(track_path, {"source": input_video_path, "fps": reader.fps, "cuts": tracker.cuts})
+    return track_path, index
+
+def run_moviepy_processing(config, input_video_path, output_video_path, logger='bar'):
+    # moviepy тяжелый (тянет за собой много зависимостей), нужен только здесь
+    import moviepy.editor as mpe
+    try:
+        clip = mpe.VideoFileClip(input_video_path)
+    except Exception as e:
+        print(f"Ошибка при загрузке видео: {e}")
+        raise e
+
+    if config.get('IN_POINT') or config.get('OUT_POINT') is not None:
+        # в moviepy только фрагмент, без прогрева и прокси
+        clip = clip.subclip(config.get('IN_POINT', 0), config.get('OUT_POINT'))
+
+    # moviepy может запрашивать кадры не по порядку: трекер догоняет нужный кадр через clip.get_frame
+    tracker = Tracker(config)
+    tracker.set_frame_source(lambda t: clip.get_frame(t)[:, :, ::-1], clip.fps)
+    attach_audio(config, input_video_path, tracker)
+    processing_function = lambda gf, t: tracker.process(gf(t)[:,:,::-1], t)[:,:,::-1]
+    final_clip = clip.fl(processing_function)
+    # moviepy не умеет копировать звук без перекодирования: "copy" пишется как aac
+    encoder = ffmpeg_io.encoder_from_config(config)
+    ffmpeg_params = ["-g", "1"] if encoder['draft'] else []
+    if encoder['crf'] is not None and not encoder['bitrate']:
+        ffmpeg_params += ["-crf", str(encoder['crf'])]
+    if encoder['pix_fmt']:
+        ffmpeg_params += ["-pix_fmt", encoder['pix_fmt']]
+    final_clip.write_videofile(output_video_path, codec=encoder['codec'], audio=encoder['audio'] != "none",
+                               audio_codec='aac', preset="ultrafast" if encoder['draft'] else encoder['preset'] or "medium",
+                               bitrate=encoder['bitrate'] or None, threads=encoder['threads'] or None,
+                               ffmpeg_params=ffmpeg_params, logger=logger)
+
 if __name__ == '__main__':
     # Для теста без GUI
     pass
\ No newline at end of file
@@ -0,0 +1,122 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+# --- Кэш трекинга ---
+# Трек хранится как три .npy файла (их можно открыть через mmap):
+#   objects.npy - по записи на объект (время появления, жизнь, фаза, случайные числа стиля)
+#   frames.npy  - (uid, x, y) всех живых объектов, кадр за кадром
+#   index.npy   - смещения кадров в frames.npy (n_frames + 1)
+# Ключ - хэш исходника + параметров, которые влияют на трекинг.
+# Визуальные параметры (SHAPE, WORDS, размеры, толщина...) в ключ не входят.
+
+TRACKING_KEYS = [
+    "feature_params", "lk_params", "MAX_TRACKERS", "REDETECTION_INTERVAL",
+    "THRESHOLD", "OBJ_LIFESPAN_MIN", "OBJ_LIFESPAN_MAX", "SEED",
+    "FB_CHECK", "FB_THRESHOLD", "TRACK_SCALE", "TRACK_MAX_EDGE",
+    "REDETECT_MODE", "REDETECT_LOSS_RATE", "REDETECT_ERROR_BUDGET", "REDETECT_GRID",
+    "SPAWN_MIN_DIST", "SCENE_CUT", "SCENE_CUT_THRESHOLD", "SCENE_CUT_HIST",
+    "AUDIO_REACTIVE", "AUDIO_ONSET_THRESHOLD", "AUDIO_BURST",
+]
+
+OBJECT_DTYPE = np.dtype([
+    ("uid", np.int32), ("id", np.int32),
+    ("creation_time", np.float64), ("lifespan", np.float64), ("shimmer_phase", np.float64),
+    ("word_u", np.float64), ("size_u", np.float64),
+])
+
+POINT_DTYPE = np.dtype([("uid", np.int32), ("x", np.float32), ("y", np.float32)])
+
+def source_hash(path, chunk=4 * 1024 * 1024):
+    # Полный хэш многогигабайтного исходника - долго; берем размер, начало и конец файла
+    h = hashlib.sha1()
+    size = os.path.getsize(path)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(chunk))
+        if size > chunk:
+            f.seek(max(size - chunk, chunk))
+            h.update(f.read(chunk))
+    return h.hexdigest()
+
+def tracking_key(input_path, config):
+    params = {k: config.get(k) for k in TRACKING_KEYS}
+    blob = json.dumps(params, sort_keys=True, default=str)
+    h = hashlib.sha1()
+    h.update(source_hash(input_path).encode())
+    h.update(blob.encode())
+    return h.hexdigest()[:20]
+
+def cache_path(config, key):
+    return os.path.join(config.get("CACHE_DIR", "кэш"), "треки", key)
+
+def has_track(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+class TrackRecorder:
+    """Собирает трек во время обычного рендера и сохраняет его на диск."""
+
+    def __init__(self):
+        self.objects = []
+        self.frames = []
+        self.next_uid = 0
+
+    def record(self, objects):
+        # uid растут монотонно: новые объекты - те, у кого uid больше уже записанных
+        new = objects.uid >= self.next_uid
+        if new.any():
+            records = np.empty(int(new.sum()), OBJECT_DTYPE)
+            for name in OBJECT_DTYPE.names:
+                records[name] = getattr(objects, name)[new]
+            self.objects.append(records)
+            self.next_uid = int(objects.uid[new].max()) + 1
+
+        points = np.empty(len(objects), POINT_DTYPE)
+        points["uid"] = objects.uid
+        points["x"] = objects.points[:, 0]
+        points["y"] = objects.points[:, 1]
+        self.frames.append(points)
+
+    def save(self, path, meta):
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        objects = np.concatenate(self.objects) if self.objects else np.empty(0, OBJECT_DTYPE)
+        counts = np.array([len(f) for f in self.frames], np.int64)
+        index = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        frames = np.concatenate(self.frames) if self.frames else np.empty(0, POINT_DTYPE)
+
+        np.save(os.path.join(tmp, "objects.npy"), objects)
+        np.save(os.path.join(tmp, "frames.npy"), frames)
+        np.save(os.path.join(tmp, "index.npy"), index)
+        meta = dict(meta, n_frames=len(self.frames))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+
+        # трек появляется в кэше целиком или не появляется вовсе
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+class TrackReplay:
+    """Читает трек из кэша и отдает объекты нужного кадра (без трекинга)."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf8") as f:
+            self.meta = json.load(f)
+        self.objects = np.load(os.path.join(path, "objects.npy"), mmap_mode="r")
+        self.frames = np.load(os.path.join(path, "frames.npy"), mmap_mode="r")
+        self.index = np.load(os.path.join(path, "index.npy"), mmap_mode="r")
+        self.n_frames = self.meta["n_frames"]
+
+    def points_at(self, frame_index):
+        if frame_index >= self.n_frames:
+            return self.frames[:0]
+        return self.frames[self.index[frame_index]:self.index[frame_index + 1]]
+
+    def object_records(self, uids):
+        # objects записаны в порядке uid
+        rows = np.searchsorted(self.objects["uid"], uids)
+        return self.objects[rows]
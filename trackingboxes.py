@@ -3,6 +3,8 @@ import numpy as np
 import moviepy.editor as mpe
 import random
 import os
+from proglog import default_bar_logger
+import ffmpeg_io
 
 # --- Defaults ---
 DEFAULT_CONFIG = {
@@ -83,7 +85,7 @@ def draw_square(img, center, size, color, thickness):
     pt2 = (x + half_size, y + half_size)
     cv2.rectangle(img, pt1, pt2, color, thickness)
 
-def process_frame_with_tracking(frame, t, config):
+def process_frame_with_tracking(frame, t, config, in_place=False):
     global prev_gray, tracked_objects, frame_count, last_time
 
     if t < last_time:
@@ -93,7 +95,7 @@ def process_frame_with_tracking(frame, t, config):
     last_time = t
 
     current_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    output_frame = frame.copy()
+    output_frame = frame if in_place else frame.copy()
 
     tracked_objects = [obj for obj in tracked_objects if obj.is_alive(t)]
 
@@ -154,13 +156,6 @@ def run_video_processing(config, input_video_path, output_video_path):
     """
     print("--------------------------\n")
     print("загрузка видео ща")
-    try:
-        clip = mpe.VideoFileClip(input_video_path)
-    except Exception as e:
-        print(f"Ошибка при загрузке видео: {e}")
-        print("Проверьте, что путь к файлу указан верно и файл существует.")
-        return # Use return instead of exit
-
     print(f"рисую {config['SHAPE']}s!")
     
     # Сброс состояния трекера перед каждым запуском
@@ -170,11 +165,31 @@ def run_video_processing(config, input_video_path, output_video_path):
     frame_count = 0
     last_time = -1
 
-    processing_function = lambda gf, t: process_frame_with_tracking(gf(t)[:,:,::-1], t, config)[:,:,::-1]
-    final_clip = clip.fl(processing_function)
-
     print(f"результат сохранен в {output_video_path}...")
-    final_clip.write_videofile(output_video_path, codec='libx264', audio_codec='aac', logger='bar')
+    if ffmpeg_io.ffmpeg_available():
+        try:
+            ffmpeg_io.probe_video(input_video_path)
+        except IOError as e:
+            print(f"Ошибка при загрузке видео: {e}")
+            print("Проверьте, что путь к файлу указан верно и файл существует.")
+            return
+        # ffmpeg пайпы: BGR кадры без переворота каналов и лишних копий;
+        # ошибки кодирования и пайпов не глотаем - это не проблема входного файла
+        processing_function = lambda frame, t: process_frame_with_tracking(frame, t, config, in_place=True)
+        ffmpeg_io.stream_video(input_video_path, output_video_path, processing_function,
+                               logger=default_bar_logger('bar'))
+    else:
+        print(f"ffmpeg не найден ({ffmpeg_io.FFMPEG_BINARY}), использую moviepy")
+        try:
+            clip = mpe.VideoFileClip(input_video_path)
+        except Exception as e:
+            print(f"Ошибка при загрузке видео: {e}")
+            print("Проверьте, что путь к файлу указан верно и файл существует.")
+            return # Use return instead of exit
+
+        processing_function = lambda gf, t: process_frame_with_tracking(gf(t)[:,:,::-1], t, config)[:,:,::-1]
+        final_clip = clip.fl(processing_function)
+        final_clip.write_videofile(output_video_path, codec='libx264', audio_codec='aac', logger='bar')
     print("Готово!")
 
 def main():